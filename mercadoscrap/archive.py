@@ -0,0 +1,303 @@
+"""
+Archivo del HTML crudo de cada corrida, para volver a extraer los datos si cambia el
+markup de Mercado Libre y los extractores de ese momento fallaron.
+
+Cada corrida tiene su carpeta `<directorio>/corrida-<id>/` con:
+
+- `segment-<n>.z`: las páginas una detrás de otra, cada una como un stream zlib
+  independiente (URL, salto de línea y HTML), así se puede leer una sola página sin
+  descomprimir el resto. Un segmento se cierra al pasar `SEGMENT_BYTES`.
+- `pages.jsonl`: una línea por página (URL, categoría, número de página, segmento,
+  offset y tamaños). Es el registro de verdad: se escribe después de cada página.
+- `index.bin`: registros de tamaño fijo (`INDEX_RECORD`) ordenados por el hash de
+  (corrida, URL), pensados para abrirse con mmap y buscar por bisección. Se arma al
+  cerrar el archivo y, si falta o quedó viejo, desde `pages.jsonl`.
+
+Solo usa la biblioteca estándar.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import namedtuple
+
+from metrics import get_metrics
+
+# Carpeta por defecto del archivo de HTML
+ARCHIVE_DIR = "archive/html"
+
+# Tamaño máximo (comprimido) de un segmento antes de empezar el siguiente
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Nivel de zlib de cada página (6 comprime ~9x a ~90 MB/s con páginas de resultados)
+COMPRESSION_LEVEL = 6
+
+# Registro del índice: hash de (corrida, URL), segmento, offset y tamaño comprimido
+INDEX_RECORD = struct.Struct("<QIQI")
+
+SEGMENT_PATTERN = re.compile(r"segment-(\d+)\.z$")
+
+# Una página archivada, tal como figura en pages.jsonl
+ArchiveEntry = namedtuple(
+    "ArchiveEntry",
+    ["url", "categoria", "pagina", "segment", "offset", "size", "bytes"],
+)
+
+
+def page_key(corrida_id: int, url: str) -> int:
+    """Hash de 64 bits de (corrida, URL), la clave del índice"""
+    digest = hashlib.blake2b(f"{corrida_id}\n{url}".encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def run_directory(corrida_id: int, directory: str = ARCHIVE_DIR) -> str:
+    return os.path.join(directory, f"corrida-{corrida_id:06d}")
+
+
+def decompress_page(data: bytes):
+    """(URL, HTML en bytes UTF-8) de una página comprimida de un segmento"""
+    raw = zlib.decompress(data)
+    newline = raw.index(b"\n")
+    return raw[:newline].decode("utf-8"), raw[newline + 1 :]
+
+
+def read_entries(path: str):
+    """Las entradas de un pages.jsonl, en orden.
+
+    Si una URL se archivó más de una vez para la misma categoría (por ejemplo al
+    retomar la corrida) queda la última. La misma URL en otra categoría (una
+    subcategoría que comparte listado con su padre) es otra entrada.
+    """
+    entries = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = ArchiveEntry(**json.loads(line))
+            except (ValueError, TypeError):
+                # Una línea a medio escribir si el proceso se cortó
+                continue
+            key = (entry.url, entry.categoria)
+            entries.pop(key, None)
+            entries[key] = entry
+    return list(entries.values())
+
+
+def write_index(corrida_id: int, run_dir: str):
+    """Arma `index.bin` desde `pages.jsonl`, ordenado por clave.
+
+    Con la misma clave, primero va la página archivada más tarde.
+    """
+    entries = read_entries(os.path.join(run_dir, "pages.jsonl"))
+    rows = sorted(
+        (
+            (page_key(corrida_id, entry.url), entry.segment, entry.offset, entry.size)
+            for entry in entries
+        ),
+        key=lambda row: (row[0], -row[1], -row[2]),
+    )
+    tmp_path = os.path.join(run_dir, "index.bin.tmp")
+    with open(tmp_path, "wb") as file:
+        for row in rows:
+            file.write(INDEX_RECORD.pack(*row))
+    os.replace(tmp_path, os.path.join(run_dir, "index.bin"))
+    return len(rows)
+
+
+class ArchiveWriter:
+    """
+    Archiva las páginas descargadas de una corrida.
+
+    `add(url, html, categoria, pagina)` comprime la página fuera del lock (zlib suelta
+    el GIL) y la agrega al segmento actual. Se puede usar desde varios hilos a la vez.
+    Al retomar una corrida se crea otro escritor sobre la misma carpeta: arranca un
+    segmento nuevo y las páginas repetidas de la misma categoría reemplazan a las
+    anteriores.
+    `close()` escribe el índice.
+    """
+
+    def __init__(
+        self,
+        corrida_id: int,
+        directory: str = ARCHIVE_DIR,
+        segment_bytes: int = SEGMENT_BYTES,
+        level: int = COMPRESSION_LEVEL,
+    ):
+        self.corrida_id = corrida_id
+        self.directory = run_directory(corrida_id, directory)
+        self.segment_bytes = segment_bytes
+        self.level = level
+        self.pages = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+        segments = [
+            int(match.group(1))
+            for match in map(SEGMENT_PATTERN.search, os.listdir(self.directory))
+            if match
+        ]
+        self._segment = max(segments, default=-1) + 1
+        self._file = None
+        self._manifest = open(
+            os.path.join(self.directory, "pages.jsonl"), "a", encoding="utf-8"
+        )
+        self._lock = threading.Lock()
+
+    def _segment_file(self, size: int):
+        if self._file is not None and self._file.tell() + size > self.segment_bytes:
+            self._file.close()
+            self._file = None
+            self._segment += 1
+        if self._file is None:
+            path = os.path.join(self.directory, f"segment-{self._segment:04d}.z")
+            self._file = open(path, "ab")
+        return self._file
+
+    def add(self, url: str, html, categoria: str = None, pagina: int = None):
+        """Archiva el HTML (str o bytes UTF-8) de `url`"""
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        data = zlib.compress(url.encode("utf-8") + b"\n" + html, self.level)
+        with self._lock:
+            if self._manifest is None:
+                raise ValueError("El archivo ya está cerrado")
+            file = self._segment_file(len(data))
+            offset = file.tell()
+            file.write(data)
+            file.flush()
+            entry = ArchiveEntry(
+                url, categoria, pagina, self._segment, offset, len(data), len(html)
+            )
+            self._manifest.write(json.dumps(entry._asdict(), ensure_ascii=False) + "\n")
+            self._manifest.flush()
+            self.pages += 1
+            self.raw_bytes += len(html)
+            self.compressed_bytes += len(data)
+        get_metrics().inc("archive_bytes_total", len(data))
+
+    def summary(self) -> dict:
+        return {
+            "paginas": self.pages,
+            "bytes": self.raw_bytes,
+            "comprimido": self.compressed_bytes,
+            "ratio": (
+                round(self.raw_bytes / self.compressed_bytes, 1)
+                if self.compressed_bytes
+                else None
+            ),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._manifest is None:
+                return
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._manifest.close()
+            self._manifest = None
+        write_index(self.corrida_id, self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """
+    Lee las páginas archivadas de una corrida.
+
+    `get(url)` busca en `index.bin` (abierto con mmap, por bisección) y descomprime
+    solo esa página. `entries()` lista las páginas en el orden en que se archivaron y
+    `read(entry)` devuelve los bytes comprimidos de una, por ejemplo para
+    descomprimirlos en otro proceso con `decompress_page`.
+    """
+
+    def __init__(self, corrida_id: int, directory: str = ARCHIVE_DIR):
+        self.corrida_id = corrida_id
+        self.directory = run_directory(corrida_id, directory)
+        manifest = os.path.join(self.directory, "pages.jsonl")
+        if not os.path.exists(manifest):
+            raise FileNotFoundError(
+                f"No hay páginas archivadas de la corrida {corrida_id} en {directory}"
+            )
+        index = os.path.join(self.directory, "index.bin")
+        if not os.path.exists(index) or os.path.getmtime(index) < os.path.getmtime(
+            manifest
+        ):
+            write_index(corrida_id, self.directory)
+        self._index_file = open(index, "rb")
+        size = os.path.getsize(index)
+        self._index = (
+            mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if size
+            else b""
+        )
+        self._count = size // INDEX_RECORD.size
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def entries(self):
+        return read_entries(os.path.join(self.directory, "pages.jsonl"))
+
+    def _read(self, segment: int, offset: int, size: int) -> bytes:
+        with self._lock:
+            file = self._segments.get(segment)
+            if file is None:
+                path = os.path.join(self.directory, f"segment-{segment:04d}.z")
+                file = self._segments[segment] = open(path, "rb")
+            file.seek(offset)
+            return file.read(size)
+
+    def read(self, entry: ArchiveEntry) -> bytes:
+        return self._read(entry.segment, entry.offset, entry.size)
+
+    def get(self, url: str):
+        """El HTML archivado de `url` en esta corrida, o None si no está; si se
+        archivó para más de una categoría, el más reciente"""
+        key = page_key(self.corrida_id, url)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if (
+                INDEX_RECORD.unpack_from(self._index, middle * INDEX_RECORD.size)[0]
+                < key
+            ):
+                low = middle + 1
+            else:
+                high = middle
+        # Puede haber más de un registro con la misma clave: se verifica la URL
+        while low < self._count:
+            found, segment, offset, size = INDEX_RECORD.unpack_from(
+                self._index, low * INDEX_RECORD.size
+            )
+            if found != key:
+                break
+            archived_url, html = decompress_page(self._read(segment, offset, size))
+            if archived_url == url:
+                return html.decode("utf-8")
+            low += 1
+        return None
+
+    def close(self):
+        if isinstance(self._index, mmap.mmap):
+            self._index.close()
+        self._index_file.close()
+        for file in self._segments.values():
+            file.close()
+        self._segments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
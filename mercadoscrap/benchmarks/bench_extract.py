@@ -0,0 +1,180 @@
+"""
+Compara el extractor de una sola pasada (`extract_listings`) con la versión anterior
+de `extract_products_and_prices` (tres `findall` + filtro lineal del buy box).
+
+Uso:
+    python benchmarks/bench_extract.py [PAGINAS...] [--repeat N]
+
+PAGINAS pueden ser archivos .html o .html.gz, o carpetas (por ejemplo la caché que
+genera `main.py --cache`); por defecto, `benchmarks/fixtures`, donde
+`record_fixtures.py` graba páginas reales. Antes de medir se verifica, página por
+página, que las dos versiones devuelvan los mismos títulos y precios; si alguna
+difiere se muestra y el script termina con error.
+"""
+
+import argparse
+import gzip
+import os
+import re
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+from mercadolibre import CARD_PATTERN, extract_listings  # noqa: E402
+from prices import parse_prices  # noqa: E402
+
+
+def extract_products_and_prices_legacy(html: str):
+    """Versión anterior de `extract_products_and_prices`, como referencia"""
+    product_pattern = re.compile(
+        r'<h2 class="poly-box poly-component__title"><a[^>]*>(.*?)</a></h2>', re.DOTALL
+    )
+    price_pattern = re.compile(
+        r'<div class="poly-price__current">.*?<span class="andes-money-amount__fraction" aria-hidden="true">([\d.,]+)</span>',
+        re.DOTALL,
+    )
+    buy_box_pattern = re.compile(
+        r'<div class="poly-component__buy-box">.*?<div class="poly-price__current">.*?<span class="andes-money-amount__fraction" aria-hidden="true">([\d.,]+)</span>',
+        re.DOTALL,
+    )
+
+    products = product_pattern.findall(html)
+    buy_box_prices = buy_box_pattern.findall(html)
+    all_prices = price_pattern.findall(html)
+    filtered_prices = [price for price in all_prices if price not in buy_box_prices]
+
+    return products, filtered_prices
+
+
+def load_pages(paths):
+    """[(archivo, HTML)] de todas las páginas .html / .html.gz de los paths indicados"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.endswith((".html", ".html.gz"))
+                )
+        else:
+            files.append(path)
+
+    pages = []
+    for file in files:
+        opener = gzip.open if file.endswith(".gz") else open
+        with opener(file, "rt", encoding="utf-8") as page:
+            pages.append((file, page.read()))
+    return pages
+
+
+def legacy_pesos(fraction):
+    """Pesos de una fracción de la versión anterior; el texto tal cual si no es un
+    número, así aparece como diferencia"""
+    if fraction is None:
+        return None
+    try:
+        return parse_prices([fraction])[0] // 100
+    except ValueError:
+        return fraction
+
+
+def legacy_listings(html: str):
+    """[(título, pesos)] de la versión anterior, aplicada a cada tarjeta por separado.
+
+    Sobre la página entera sus `findall` se desalinean: una tarjeta sin precio
+    numérico toma el de la siguiente. Por tarjeta, la referencia es la misma que antes
+    en las páginas donde no había nada raro.
+    """
+    starts = [match.start() for match in CARD_PATTERN.finditer(html)] or [0]
+    rows = []
+    for start, end in zip(starts, starts[1:] + [len(html)]):
+        products, fractions = extract_products_and_prices_legacy(html[start:end])
+        for index, title in enumerate(products):
+            fraction = fractions[index] if index < len(fractions) else None
+            rows.append((title, legacy_pesos(fraction)))
+    return rows
+
+
+def compare(html: str):
+    """Diferencias entre las dos versiones en una página, o [] si coinciden.
+
+    La versión anterior no lee los centavos, así que los precios se comparan en pesos.
+    """
+    legacy = legacy_listings(html)
+    single = [
+        (listing.title, listing.price // 100 if listing.price is not None else None)
+        for listing in extract_listings(html)
+    ]
+    if legacy == single:
+        return []
+    differences = []
+    if len(legacy) != len(single):
+        differences.append(f"{len(legacy)} tarjetas antes, {len(single)} ahora")
+    for index, (old, new) in enumerate(zip(legacy, single)):
+        if old != new:
+            differences.append(f"tarjeta #{index}: {old!r} antes, {new!r} ahora")
+            break
+    return differences
+
+
+def check(pages) -> bool:
+    """Compara las dos versiones en cada página e imprime las que difieren"""
+    equal = True
+    for name, html in pages:
+        differences = compare(html)
+        if differences:
+            equal = False
+            print(f"DIFIERE {os.path.basename(name)}: {'; '.join(differences)}")
+    return equal
+
+
+def bench(function, pages, repeat):
+    """Mejor tiempo (en segundos) de procesar todas las páginas `repeat` veces"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            function(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=[FIXTURES_DIR])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    named_pages = load_pages(args.paths)
+    if not named_pages:
+        sys.exit("No se encontraron páginas.")
+    equal = check(named_pages)
+    print(
+        f"Equivalencia: {'idénticas' if equal else 'con diferencias'} "
+        f"en {len(named_pages)} páginas"
+    )
+    pages = [html for _, html in named_pages]
+    megabytes = sum(len(html) for html in pages) / 1e6
+
+    legacy = bench(extract_products_and_prices_legacy, pages, args.repeat)
+    single = bench(extract_listings, pages, args.repeat)
+
+    records = sum(len(extract_listings(html)) for html in pages)
+    print(f"{len(pages)} páginas, {megabytes:.1f} MB, {records} productos")
+    for name, seconds in (("anterior (3 findall)", legacy), ("una pasada", single)):
+        print(
+            f"{name:>22}: {seconds * 1000:8.1f} ms "
+            f"({megabytes / seconds:6.1f} MB/s, {records / seconds:9.0f} productos/s)"
+        )
+    print(f"{'aceleración':>22}: {legacy / single:.2f}x")
+    if not equal:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Chequeo de regresión del tiempo de arranque del scraper headless.
+
+Importa `scrape` (y con él main, mercadolibre, fetcher, cache y database) en un
+intérprete nuevo varias veces y se queda con el mejor tiempo. Falla (exit 1) si supera
+el presupuesto o si se cargó alguno de los módulos que solo hacen falta para graficar.
+
+Uso:
+    python benchmarks/bench_import.py [--budget-ms 500] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MERCADOSCRAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Módulos que el arranque headless no debería cargar
+HEAVY_MODULES = ["pandas", "matplotlib", "seaborn", "PyQt6"]
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import scrape
+elapsed = time.perf_counter() - start
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(json.dumps({{"ms": elapsed * 1000, "heavy": heavy}}))
+"""
+
+
+def measure():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=MERCADOSCRAP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.repeat)]
+    best = min(result["ms"] for result in results)
+    heavy = sorted({name for result in results for name in result["heavy"]})
+
+    print(f"import scrape: {best:.0f} ms (presupuesto {args.budget_ms:.0f} ms)")
+    errors = []
+    if best > args.budget_ms:
+        errors.append(f"el arranque tardó {best:.0f} ms")
+    if heavy:
+        errors.append(f"se importaron módulos pesados: {', '.join(heavy)}")
+    if errors:
+        sys.exit("REGRESIÓN: " + "; ".join(errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Mide `insert_data` con muchos productos y lo compara con la versión anterior
+(una consulta por producto, sin índice y un commit por categoría nueva).
+
+Uso:
+    python benchmarks/bench_insert.py [--productos N] [--categorias N] [--legacy-max N]
+
+La versión anterior crece de forma cuadrática, así que solo se mide hasta
+`--legacy-max` productos.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import (  # noqa: E402
+    Base,
+    Categoria,
+    Producto,
+    insert_data,
+    limpiar_precio,
+)
+
+
+def insert_data_legacy(datadict, db_url):
+    """Versión anterior de `insert_data`, como referencia"""
+    engine = create_engine(db_url)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    for categoria_nombre, productos in datadict.items():
+        categoria = session.query(Categoria).filter_by(nombre=categoria_nombre).first()
+        if not categoria:
+            categoria = Categoria(nombre=categoria_nombre)
+            session.add(categoria)
+            session.commit()
+
+        for producto_nombre, info in productos.items():
+            precio_limpio = limpiar_precio(info["Precio"][0])
+            producto_existente = (
+                session.query(Producto)
+                .filter_by(nombre=producto_nombre, precio=precio_limpio)
+                .first()
+            )
+            if not producto_existente:
+                session.add(
+                    Producto(
+                        nombre=producto_nombre,
+                        precio=precio_limpio,
+                        categoria=categoria,
+                    )
+                )
+
+        session.commit()
+    session.close()
+    engine.dispose()
+
+
+def make_datadict(productos: int, categorias: int, seed: int = 0):
+    """Genera datos con la misma forma que devuelve `scrape_all_pages`"""
+    rnd = random.Random(seed)
+    datadict = {f"Categoría {c}": {} for c in range(categorias)}
+    for index in range(productos):
+        precio = f"${rnd.randint(1, 999)},{rnd.randint(100, 999)}"
+        datadict[f"Categoría {index % categorias}"][f"Producto {index}"] = {
+            "Precio": [precio]
+        }
+    return datadict
+
+
+def bench(function, datadict, label):
+    with tempfile.TemporaryDirectory() as directory:
+        db_url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        start = time.perf_counter()
+        function(datadict, db_url)
+        first = time.perf_counter() - start
+        # Segunda pasada con los mismos datos: todo ya existe
+        start = time.perf_counter()
+        function(datadict, db_url)
+        second = time.perf_counter() - start
+    total = sum(len(productos) for productos in datadict.values())
+    print(
+        f"{label:>10}: {total:>7} productos  "
+        f"inserción {first:7.2f} s ({total / first:9.0f}/s)  "
+        f"re-inserción {second:7.2f} s ({total / second:9.0f}/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--productos", type=int, default=100_000)
+    parser.add_argument("--categorias", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=5_000)
+    args = parser.parse_args()
+
+    legacy_size = min(args.productos, args.legacy_max)
+    bench(
+        insert_data_legacy,
+        make_datadict(legacy_size, args.categorias),
+        "anterior",
+    )
+    bench(insert_data, make_datadict(legacy_size, args.categorias), "bulk")
+    if args.productos > legacy_size:
+        bench(insert_data, make_datadict(args.productos, args.categorias), "bulk")
+
+
+if __name__ == "__main__":
+    main()
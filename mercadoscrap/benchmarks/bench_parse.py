@@ -0,0 +1,87 @@
+"""
+Mide el parseo de páginas en procesos aparte (`parsing.ParserPool`) contra el parseo
+en el mismo hilo, sirviendo las páginas desde la caché como en `main.py --replay`.
+
+Genera `--paginas` páginas sintéticas (ver `synthetic.py`), las guarda en una
+`HtmlCache` temporal y recorre la búsqueda con `iter_listings` sin pool y con pools de
+1, 2, 4, ... procesos hasta `--procesos`. Verifica que todas las variantes devuelvan
+las mismas publicaciones en el mismo orden.
+
+Uso:
+    python benchmarks/bench_parse.py [--paginas 200] [--procesos N] [--relleno 3000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cache import HtmlCache  # noqa: E402
+from fetcher import Fetcher  # noqa: E402
+from mercadolibre import PRODUCTS_PER_PAGE, get_page_urls, iter_listings  # noqa: E402
+from parsing import ParserPool  # noqa: E402
+from synthetic import URL_LISTADO, listing_pages  # noqa: E402
+
+URL = f"{URL_LISTADO}/cuchara-madera_NoIndex_True"
+
+
+def fill_cache(cache: HtmlCache, pages: int, padding: int):
+    """Guarda en `cache` las páginas sintéticas de una búsqueda de `pages` páginas"""
+    htmls = listing_pages(pages, PRODUCTS_PER_PAGE, padding=padding)
+    for page_url, html in zip(get_page_urls(URL, pages * PRODUCTS_PER_PAGE), htmls):
+        cache.put(page_url, html)
+    return sum(len(html) for html in htmls)
+
+
+def crawl(fetcher: Fetcher, pool):
+    """Recorre la búsqueda desde la caché y devuelve (segundos, publicaciones)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pages = list(iter_listings(URL, fetcher=fetcher, parser_pool=pool))
+    return time.perf_counter() - start, [listings for _, _, listings in pages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paginas", type=int, default=200)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--relleno", type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HtmlCache(directory, ttl=0)
+        size = fill_cache(cache, args.paginas, args.relleno)
+        print(
+            f"{args.paginas} páginas, {size / 2**20:.1f} MB de HTML, "
+            f"{os.cpu_count()} núcleos"
+        )
+        fetcher = Fetcher(cache=cache, replay=True)
+
+        seconds, expected = crawl(fetcher, None)
+        print(
+            f"{'en el hilo':>12}: {seconds:6.2f} s  {args.paginas / seconds:7.1f} pág/s"
+        )
+
+        workers = 1
+        while workers <= args.procesos:
+            pool = ParserPool(workers)
+            # La primera tanda arranca los procesos; no la contamos
+            crawl(fetcher, pool)
+            seconds, result = crawl(fetcher, pool)
+            pool.close()
+            if result != expected:
+                sys.exit(f"Con {workers} procesos las publicaciones no coinciden")
+            print(
+                f"{workers:>3} procesos: {seconds:6.2f} s  "
+                f"{args.paginas / seconds:7.1f} pág/s"
+            )
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
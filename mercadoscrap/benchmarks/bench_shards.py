@@ -0,0 +1,137 @@
+"""
+Simula una categoría más grande que el tope de resultados de Mercado Libre y compara
+recorrerla por desplazamiento contra recorrerla con `plan_shards`.
+
+El catálogo tiene `--publicaciones` publicaciones con precios log-normales. Un fetcher
+falso sirve sus páginas respetando `_PriceRange_` y `_Desde_` y, como el sitio, no
+devuelve nada más allá de `LISTING_CAP`. Se informa cuántas solicitudes hizo cada
+estrategia y qué parte del catálogo cubrió. Falla (exit 1) si con rangos de precio no
+se cubre todo el catálogo.
+
+Uso:
+    python benchmarks/bench_shards.py [--publicaciones 30000] [--sigma 1.2]
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dedup import ListingIndex  # noqa: E402
+from mercadolibre import (  # noqa: E402
+    LISTING_CAP,
+    PRODUCTS_PER_PAGE,
+    iter_listings,
+    plan_shards,
+)
+from synthetic import URL_LISTADO, card, format_fraction  # noqa: E402
+
+URL = f"{URL_LISTADO}/cuchara-madera_NoIndex_True"
+
+RANGE_PATTERN = re.compile(r"_PriceRange_(\d+)-(\d+)")
+OFFSET_PATTERN = re.compile(r"_Desde_(\d+)")
+
+
+class CatalogFetcher:
+    """Fetcher falso: sirve las páginas de un catálogo en memoria y cuenta solicitudes"""
+
+    def __init__(self, prices, cap: int = LISTING_CAP):
+        # (índice, centavos), en orden de "relevancia"
+        self.items = list(enumerate(prices))
+        self.cap = cap
+        self.requests = 0
+
+    def get_text(self, url: str, limiter=None) -> str:
+        self.requests += 1
+        items = self.items
+        price_range = RANGE_PATTERN.search(url)
+        if price_range:
+            low, high = (int(value) * 100 for value in price_range.groups())
+            items = [
+                (index, cents)
+                for index, cents in items
+                if low <= cents and (not high or cents <= high)
+            ]
+        offset = OFFSET_PATTERN.search(url)
+        start = int(offset.group(1)) - 1 if offset else 0
+        page = items[start : start + PRODUCTS_PER_PAGE] if start < self.cap else []
+        cards = "".join(
+            card(index, cents // 100, cents % 100, buy_box=index % 5 == 0)
+            for index, cents in page
+        )
+        return (
+            '<html><body><span class="ui-search-search-result__quantity-results">'
+            f"{format_fraction(len(items))} resultados</span>"
+            f'<ol class="ui-search-layout">{cards}</ol></body></html>'
+        )
+
+
+def crawl(fetcher, url: str):
+    """Planifica los rangos y recorre cada uno apenas sale, como `stream_category`.
+
+    Devuelve (ids distintos encontrados, rangos, páginas recorridas, solicitudes de
+    planificación).
+    """
+    seen = ListingIndex()
+    shards = pages = crawling = 0
+    for shard in plan_shards(url, fetcher=fetcher):
+        shards += 1
+        for page, _, _ in iter_listings(
+            shard.url, fetcher=fetcher, seen=seen, first_html=shard.html
+        ):
+            pages += 1
+            # La primera página ya la pidió la planificación, si vino en el rango
+            crawling += page > 1 or shard.html is None
+    # Las pruebas de rangos se siguen pidiendo en paralelo mientras se recorre un
+    # rango, así que las de planificación se cuentan como todo lo que no es recorrido
+    return seen.unique, shards, pages, fetcher.requests - crawling
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--publicaciones", type=int, default=30000)
+    parser.add_argument("--mediana", type=float, default=20000, help="En pesos")
+    parser.add_argument("--sigma", type=float, default=1.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    prices = [
+        max(100, int(rnd.lognormvariate(math.log(args.mediana), args.sigma) * 100))
+        for _ in range(args.publicaciones)
+    ]
+    total = len(prices)
+    needed = math.ceil(total / PRODUCTS_PER_PAGE)
+    print(
+        f"{total} publicaciones: {needed} páginas como mínimo, "
+        f"tope de {LISTING_CAP} resultados por búsqueda"
+    )
+
+    # Antes: se pedían todas las páginas por desplazamiento, vacías después del tope
+    naive_requests = needed
+    naive_covered = min(total, LISTING_CAP)
+    print(
+        f"{'desplazamiento':>16}: {naive_requests:5} solicitudes, "
+        f"{naive_covered / total:6.1%} cubierto"
+    )
+
+    fetcher = CatalogFetcher(prices)
+    with contextlib.redirect_stdout(io.StringIO()):
+        covered, shards, pages, planning = crawl(fetcher, URL)
+    print(
+        f"{'rangos de precio':>16}: {fetcher.requests:5} solicitudes, "
+        f"{covered / total:6.1%} cubierto ({shards} rangos, "
+        f"{planning} solicitudes de planificación, {pages} páginas)"
+    )
+    if covered < total:
+        sys.exit(f"Quedaron {total - covered} publicaciones sin cubrir")
+
+
+if __name__ == "__main__":
+    main()
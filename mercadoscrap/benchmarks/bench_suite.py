@@ -0,0 +1,220 @@
+"""
+Suite de benchmarks offline de los caminos calientes del scraper.
+
+Mide, sobre páginas sintéticas (ver `synthetic.py`) y las de `benchmarks/fixtures`:
+`extract_products_and_prices`, `get_categories`, `get_total_results`, `insert_data`
+y las agregaciones de `DataVisualizer`. Cada caso se corre `--repeat` veces y se
+guarda el mejor tiempo. El resultado se escribe como JSON, junto con el commit y la
+versión de Python, para poder comparar entre commits.
+
+Uso:
+    python benchmarks/bench_suite.py [--output resultados.json] [--compare base.json]
+                                     [--paginas N] [--productos N] [--repeat N]
+
+Con `--compare` sale con error (exit 1) si algún caso quedó más de `--tolerance`
+veces (y más de `MIN_DELTA` segundos) más lento que en el JSON de referencia.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+from database import get_engine, insert_data  # noqa: E402
+from mercadolibre import (  # noqa: E402
+    extract_products_and_prices,
+    get_categories,
+    get_total_results,
+)
+from synthetic import listing_pages  # noqa: E402
+
+# Cuántas veces más lento que la referencia cuenta como regresión
+TOLERANCE = 1.25
+
+# Diferencias menores a esto (en segundos) se consideran ruido aunque superen TOLERANCE
+MIN_DELTA = 0.002
+
+
+def timeit(function, repeat: int) -> float:
+    """Mejor tiempo (en segundos) de `repeat` llamadas a `function`"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_fixtures(directory: str = FIXTURES_DIR):
+    """Páginas .html / .html.gz de `directory`, por nombre de archivo"""
+    pages = {}
+    if not os.path.isdir(directory):
+        return pages
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith((".html", ".html.gz")):
+            continue
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(os.path.join(directory, name), "rt", encoding="utf-8") as file:
+            pages[name] = file.read()
+    return pages
+
+
+def make_datadict(pages):
+    """Arma {categoría: {producto: {"Precio": [...], "Id": [...]}}} desde las páginas,
+    con la misma forma que `scrape_all_pages`, repartidas en 10 categorías"""
+    datadict = {}
+    for index, html in enumerate(pages):
+        productos = datadict.setdefault(f"Categoría {index % 10}", {})
+        for title, price in zip(*extract_products_and_prices(html)):
+            info = productos.setdefault(title.strip(), {"Precio": [], "Id": []})
+            info["Precio"].append(price)
+            info["Id"].append(None)
+    return datadict
+
+
+def run(pages: int, products: int, repeat: int) -> dict:
+    results = {}
+
+    def record(name, function, items=None, repeat=repeat):
+        seconds = timeit(function, repeat)
+        results[name] = {"segundos": seconds}
+        if items:
+            results[name]["items"] = items
+            results[name]["items_por_segundo"] = items / seconds
+        print(f"{name:>40}: {seconds * 1000:10.2f} ms")
+
+    synthetic = listing_pages(pages, products)
+    records = sum(len(extract_products_and_prices(html)[0]) for html in synthetic)
+    record(
+        "extract_products_and_prices",
+        lambda: [extract_products_and_prices(html) for html in synthetic],
+        records,
+    )
+    record(
+        "get_total_results",
+        lambda: [get_total_results(html) for html in synthetic],
+        len(synthetic),
+    )
+    for strategy in ("regions", "strainer", "full"):
+        record(
+            f"get_categories[{strategy}]",
+            lambda: get_categories(synthetic[0], strategy=strategy),
+        )
+
+    for name, html in load_fixtures().items():
+        record(f"fixture[{name}].extract", lambda: extract_products_and_prices(html))
+        record(f"fixture[{name}].get_categories", lambda: get_categories(html))
+
+    datadict = make_datadict(synthetic)
+    with tempfile.TemporaryDirectory() as directory:
+        db_url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        get_engine(db_url)
+        # Una sola pasada: la segunda encontraría todo ya guardado
+        record("insert_data", lambda: insert_data(datadict, db_url), records, 1)
+        record(
+            "insert_data[ya_guardado]",
+            lambda: insert_data(datadict, db_url),
+            records,
+        )
+
+        try:
+            from visualizer import DataVisualizer
+        except ImportError as error:
+            print(f"Salteando DataVisualizer: {error}")
+        else:
+            visualizer = DataVisualizer(db_url)
+            record(
+                "DataVisualizer.suma_precios_por_categoria",
+                visualizer.suma_precios_por_categoria,
+            )
+            record(
+                "DataVisualizer.productos_por_categoria",
+                visualizer.productos_por_categoria,
+            )
+            record(
+                "DataVisualizer.resumen_por_categoria",
+                visualizer.resumen_por_categoria,
+            )
+        get_engine(db_url).dispose()
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCHMARKS_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Lista de casos que quedaron más de `tolerance` veces más lentos"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("resultados", {}).get(name)
+        if not before:
+            continue
+        ratio = result["segundos"] / before["segundos"]
+        print(f"{name:>40}: {ratio:5.2f}x respecto de {baseline.get('commit')}")
+        if ratio > tolerance and result["segundos"] - before["segundos"] > MIN_DELTA:
+            regressions.append(f"{name} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--output", default=None, help="JSON donde guardar el resultado"
+    )
+    parser.add_argument("--compare", default=None, help="JSON de referencia")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--paginas", type=int, default=40)
+    parser.add_argument("--productos", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {
+            "paginas": args.paginas,
+            "productos": args.productos,
+            "repeat": args.repeat,
+        },
+        "resultados": run(args.paginas, args.productos, args.repeat),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report["resultados"], baseline, args.tolerance)
+        if regressions:
+            sys.exit("REGRESIÓN: " + ", ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Prueba el control adaptativo de solicitudes (`ratelimit`) contra un servidor local
+que simula el throttling de Mercado Libre.
+
+El servidor atiende hasta `--capacidad` solicitudes a la vez; por encima de eso
+responde 429 con Retry-After, y la latencia crece con la carga. Del lado del cliente
+muchos hilos piden páginas con el `Fetcher` compartido, con y sin control adaptativo.
+Falla (exit 1) si con el control adaptativo el límite no converge cerca de la
+capacidad o si la segunda mitad de la corrida sigue recibiendo muchos 429.
+
+Uso:
+    python benchmarks/bench_throttle.py [--capacidad 6] [--hilos 32] [--paginas 600]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fetcher import Fetcher  # noqa: E402
+
+# Latencia base del servidor y cuánto suma cada solicitud en paralelo (en segundos)
+BASE_LATENCY = 0.02
+LATENCY_PER_REQUEST = 0.005
+
+# Proporción máxima de 429 en la segunda mitad de la corrida para darla por convergida
+MAX_THROTTLED_SHARE = 0.1
+
+
+class ThrottlingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, capacity: int, retry_after: str):
+        super().__init__(("127.0.0.1", 0), ThrottlingHandler)
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.log = []
+        self.lock = threading.Lock()
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            load = server.in_flight
+        try:
+            time.sleep(BASE_LATENCY + LATENCY_PER_REQUEST * load)
+            throttled = load > server.capacity
+            body = (
+                b"<html>demasiadas solicitudes</html>"
+                if throttled
+                else b"<html>ok</html>"
+            )
+            self.send_response(429 if throttled else 200)
+            if throttled and server.retry_after:
+                self.send_header("Retry-After", server.retry_after)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with server.lock:
+                server.log.append((time.monotonic(), throttled))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def run(capacity: int, threads: int, pages: int, adaptive: bool, retry_after: str):
+    server = ThrottlingServer(capacity, retry_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    fetcher = Fetcher(
+        pool_size=threads, max_retries=10, backoff_base=0.01, adaptive=adaptive
+    )
+    host = fetcher.controller.host(base_url) if adaptive else None
+    samples = []
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            samples.append(host.limit)
+
+    if adaptive:
+        threading.Thread(target=sample, daemon=True).start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(fetcher.get, (f"{base_url}/p/{n}" for n in range(pages))))
+    elapsed = time.perf_counter() - start
+    done.set()
+    server.shutdown()
+    fetcher.close()
+
+    log = server.log
+    second_half = log[len(log) // 2 :]
+    late_samples = samples[len(samples) // 2 :]
+    return {
+        "segundos": elapsed,
+        "solicitudes": len(log),
+        "429": sum(throttled for _, throttled in log),
+        "429_segunda_mitad": sum(throttled for _, throttled in second_half)
+        / max(len(second_half), 1),
+        "limite_medio": sum(late_samples) / len(late_samples) if late_samples else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--capacidad", type=int, default=6)
+    parser.add_argument("--hilos", type=int, default=32)
+    parser.add_argument("--paginas", type=int, default=600)
+    parser.add_argument(
+        "--retry-after", default="", help="Valor del header Retry-After en los 429"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for label, adaptive in (("fijo", False), ("adaptativo", True)):
+        result = results[label] = run(
+            args.capacidad, args.hilos, args.paginas, adaptive, args.retry_after
+        )
+        limit = result["limite_medio"]
+        print(
+            f"{label:>10}: {result['segundos']:6.2f} s  "
+            f"{result['solicitudes']:5} solicitudes  {result['429']:5} respuestas 429  "
+            f"({result['429_segunda_mitad']:.0%} en la segunda mitad)"
+            + (f"  límite medio {limit:.1f}" if limit is not None else "")
+        )
+
+    adaptive = results["adaptativo"]
+    errors = []
+    if not 0.4 * args.capacidad <= adaptive["limite_medio"] <= 1.6 * args.capacidad:
+        errors.append(
+            f"el límite quedó en {adaptive['limite_medio']:.1f} "
+            f"para una capacidad de {args.capacidad}"
+        )
+    if adaptive["429_segunda_mitad"] > MAX_THROTTLED_SHARE:
+        errors.append(f"{adaptive['429_segunda_mitad']:.0%} de 429 en la segunda mitad")
+    if errors:
+        sys.exit("NO CONVERGE: " + "; ".join(errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Graba páginas de resultados reales de Mercado Libre en `benchmarks/fixtures`, así
+`bench_extract.py` y `bench_suite.py` miden y comparan sobre el markup del sitio y no
+solo sobre las páginas sintéticas.
+
+Uso:
+    python benchmarks/record_fixtures.py BUSQUEDA... [--paginas N]
+    python benchmarks/record_fixtures.py celular --cache --replay
+
+Cada página queda en `grabada-<busqueda>-p<n>.html.gz`. Con `--cache [DIR]` se usa (y
+se llena) la caché de `main.py --cache`; con `--replay` se graban páginas ya
+cacheadas, sin salir a la red.
+"""
+
+import argparse
+import gzip
+import os
+import re
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+from cache import CACHE_DIR, HtmlCache  # noqa: E402
+from fetcher import Fetcher  # noqa: E402
+from main import search_url  # noqa: E402
+from mercadolibre import (  # noqa: E402
+    extract_listings,
+    get_page_urls,
+    get_total_results,
+)
+
+
+def fixture_name(search: str, page: int) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", search.lower()).strip("-")
+    return f"grabada-{slug}-p{page}.html.gz"
+
+
+def record(fetcher: Fetcher, search: str, pages: int, directory: str = FIXTURES_DIR):
+    """Graba las primeras `pages` páginas de la búsqueda; devuelve los archivos"""
+    url = search_url(search)
+    html = fetcher.get_text(url)
+    urls = get_page_urls(url, get_total_results(html))[:pages]
+    written = []
+    for page, page_url in enumerate(urls, start=1):
+        if page > 1:
+            html = fetcher.get_text(page_url)
+        path = os.path.join(directory, fixture_name(search, page))
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            file.write(html)
+        print(f"{path}: {len(extract_listings(html))} productos")
+        written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("busquedas", nargs="+")
+    parser.add_argument(
+        "--paginas", type=int, default=1, help="Páginas por búsqueda (por defecto 1)"
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=CACHE_DIR,
+        default=None,
+        help=f"Usa la caché de HTML (por defecto en {CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--replay", action="store_true", help="Solo graba páginas ya cacheadas"
+    )
+    parser.add_argument("--destino", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    cache = HtmlCache(args.cache or CACHE_DIR) if args.cache or args.replay else None
+    fetcher = Fetcher(cache=cache, replay=args.replay)
+    os.makedirs(args.destino, exist_ok=True)
+    try:
+        for search in args.busquedas:
+            record(fetcher, search, args.paginas, args.destino)
+    finally:
+        fetcher.close()
+
+
+if __name__ == "__main__":
+    main()
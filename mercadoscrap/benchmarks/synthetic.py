@@ -0,0 +1,212 @@
+"""
+Generador de páginas sintéticas de Mercado Libre para los benchmarks.
+
+Las páginas siguen el markup real de la grilla (`poly-card`, con precio anterior,
+centavos, cuotas y a veces buy box) y de la barra lateral de filtros
+(`ui-search-filter-dl`), con el relleno de scripts y estilos que hace que una página
+real pese varios cientos de KB. Todo sale de una semilla, así que las mismas opciones
+generan siempre el mismo HTML.
+
+Uso:
+    python benchmarks/synthetic.py DIRECTORIO [--paginas N] [--productos N]
+
+escribe N páginas .html.gz en DIRECTORIO (por ejemplo para `bench_extract.py`).
+"""
+
+import argparse
+import gzip
+import os
+import random
+
+URL_LISTADO = "https://listado.mercadolibre.com.ar"
+URL_ARTICULO = "https://articulo.mercadolibre.com.ar"
+
+# Textos de precio que no son un número, para `listing_page(odd_prices=True)`
+ODD_FRACTIONS = ("Consultar", " 12.345 ", "12.345\n", "")
+
+BUY_BOX = (
+    '<div class="poly-component__buy-box"><div class="poly-price__current">'
+    '<span class="andes-money-amount__fraction" aria-hidden="true">1</span>'
+    "</div></div>"
+)
+
+
+def format_fraction(pesos: int) -> str:
+    """Pesos como los muestra `andes-money-amount__fraction`: "12.345" """
+    return f"{pesos:,}".replace(",", ".")
+
+
+def card(
+    index: int, pesos: int, cents: int = 0, buy_box: bool = False, fraction: str = None
+) -> str:
+    """Una tarjeta `poly-card` de la grilla de resultados; `fraction` reemplaza el texto
+    del precio actual (por ejemplo "Consultar")"""
+    if fraction is None:
+        fraction = format_fraction(pesos)
+    cents_span = (
+        '<span class="andes-money-amount__cents '
+        'andes-money-amount__cents--superscript-24" style="font-size:12px" '
+        f'aria-hidden="true">{cents:02d}</span>'
+        if cents
+        else ""
+    )
+    item_id = 1_400_000_000 + index
+    return (
+        '<li class="ui-search-layout__item">'
+        '<div class="poly-card poly-card--list poly-card--large">'
+        '<div class="poly-card__portada"><img decoding="async" '
+        f'src="https://http2.mlstatic.com/D_Q_NP_2X_{item_id}-V.webp" '
+        f'class="poly-component__picture" alt="Producto {index}" width="284" '
+        'height="284"/></div><div class="poly-card__content">'
+        '<span class="poly-component__highlight" '
+        'style="color:#ffffff;background-color:#ff7733">MÁS VENDIDO</span>'
+        '<h2 class="poly-box poly-component__title">'
+        f'<a href="{URL_ARTICULO}/MLA-{item_id}-producto-{index}-_JM'
+        f"#polycard_client=search-nordic&amp;position={index}&amp;"
+        'search_layout=stack&amp;type=item&amp;tracking_id=6f1c" target="_self">'
+        f"Producto {index} De Madera Cocina</a></h2>"
+        '<span class="poly-component__seller">Por Vendedor</span>'
+        '<div class="poly-component__reviews">'
+        '<span class="poly-reviews__rating">4.8</span>'
+        '<span class="poly-reviews__total">(120)</span></div>'
+        '<div class="poly-component__price">'
+        '<s class="andes-money-amount andes-money-amount--previous '
+        'andes-money-amount--cents-comma" role="img" '
+        f'aria-label="Antes: {pesos * 2} pesos">'
+        '<span class="andes-money-amount__currency-symbol" aria-hidden="true">$</span>'
+        '<span class="andes-money-amount__fraction" aria-hidden="true">'
+        f"{format_fraction(pesos * 2)}</span></s>"
+        '<div class="poly-price__current">'
+        '<span class="andes-money-amount andes-money-amount--cents-superscript" '
+        f'style="font-size:24px" role="img" aria-label="{pesos} pesos" '
+        'aria-roledescription="Precio">'
+        '<span class="andes-money-amount__currency-symbol" aria-hidden="true">$</span>'
+        f'<span class="andes-money-amount__fraction" aria-hidden="true">{fraction}'
+        f"</span>{cents_span}</span>"
+        '<span class="andes-money-amount__discount" style="font-size:14px">'
+        "50% OFF</span></div>"
+        '<span class="poly-price__installments poly-text-positive">'
+        'Mismo precio en 6 cuotas de <span class="andes-money-amount">'
+        f"${format_fraction(pesos // 6)}</span></span></div>"
+        '<div class="poly-component__shipping">Envío gratis</div>'
+        f'{BUY_BOX if buy_box else ""}</div></div></li>'
+    )
+
+
+def sidebar(
+    groups=("Categorías", "Marca", "Color", "Precio", "Envío", "Condición"),
+    items: int = 12,
+) -> str:
+    """Barra lateral con un bloque `ui-search-filter-dl` por grupo de filtros"""
+    blocks = ['<aside class="ui-search-sidebar">']
+    for group in groups:
+        slug = group.lower().replace(" ", "-")
+        entries = "".join(
+            '<li class="ui-search-filter-container">'
+            f'<a href="{URL_LISTADO}/{slug}-{k}/cuchara-madera_NoIndex_True" '
+            'class="ui-search-link" rel="nofollow">'
+            f'<span class="ui-search-filter-name">{group} {k}</span>'
+            f'<span class="ui-search-filter-results-qty">({1000 + k * 37})</span>'
+            "</a></li>"
+            for k in range(items)
+        )
+        blocks.append(
+            '<div class="ui-search-filter-dl">'
+            '<h3 aria-level="3" class="ui-search-filter-dt-title">'
+            f"{group}</h3><ul>{entries}</ul></div>"
+        )
+    blocks.append("</aside>")
+    return "".join(blocks)
+
+
+def listing_page(
+    products: int = 50,
+    start: int = 0,
+    total: int = 1000,
+    seed: int = 0,
+    categories: bool = True,
+    padding: int = 3000,
+    odd_prices: bool = False,
+) -> str:
+    """
+    Una página de resultados con `products` tarjetas a partir del producto `start`.
+
+    Una de cada cinco tarjetas trae buy box y más o menos un tercio trae centavos.
+    `padding` controla el relleno de scripts y estilos (0 para una página mínima).
+    Con `odd_prices` una de cada siete tarjetas trae como precio un texto de
+    `ODD_FRACTIONS` en lugar de un número.
+    """
+    rnd = random.Random(seed)
+    cards = "".join(
+        card(
+            start + k,
+            rnd.randint(1_000, 999_999),
+            rnd.choice((0, 0, 50, 99)),
+            buy_box=(start + k) % 5 == 0,
+            fraction=(
+                ODD_FRACTIONS[k // 7 % len(ODD_FRACTIONS)]
+                if odd_prices and k % 7 == 3
+                else None
+            ),
+        )
+        for k in range(products)
+    )
+    head = (
+        "<!DOCTYPE html><html><head>"
+        + "<script>var x=1;</script>" * (padding // 60)
+        + "<style>"
+        + "a{color:red}" * (padding * 2 // 3)
+        + "</style></head><body>"
+    )
+    breadcrumb = (
+        '<ol class="andes-breadcrumb"><li><a href="#"><span>Hogar</span></a></li>'
+        "<li><span>Cocina</span></li></ol>"
+        '<h1 class="ui-search-breadcrumb__title">cuchara madera</h1>'
+    )
+    return (
+        head
+        + breadcrumb
+        + (sidebar() if categories else sidebar(groups=("Marca", "Color")))
+        + '<span class="ui-search-search-result__quantity-results">'
+        f"{format_fraction(total)} resultados</span>"
+        + f'<ol class="ui-search-layout">{cards}</ol>'
+        + "<script>"
+        + "window.x={};" * padding
+        + "</script></body></html>"
+    )
+
+
+def listing_pages(pages: int, products: int = 50, seed: int = 0, **kwargs):
+    """Las `pages` páginas consecutivas de una búsqueda de `pages * products` resultados"""
+    return [
+        listing_page(
+            products,
+            start=page * products,
+            total=pages * products,
+            seed=seed + page,
+            **kwargs,
+        )
+        for page in range(pages)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--productos", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for page, html in enumerate(
+        listing_pages(args.paginas, args.productos, args.seed), start=1
+    ):
+        path = os.path.join(args.directory, f"pagina-{page:03d}.html.gz")
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            file.write(html)
+    print(f"{args.paginas} páginas en {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
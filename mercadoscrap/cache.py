@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+# Carpeta por defecto de la caché de HTML
+CACHE_DIR = ".cache/html"
+
+# Tiempo de vida de una página en la caché (en segundos)
+CACHE_TTL = 24 * 60 * 60
+
+# Tamaño máximo de la caché en disco (en bytes, ya comprimido)
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class HtmlCache:
+    """
+    Caché en disco del HTML descargado, direccionada por el hash de la URL.
+
+    Cada página se guarda comprimida con gzip en `directory/<ab>/<sha256(url)>.html.gz`.
+    Las entradas más viejas que `ttl` segundos se consideran vencidas, y cuando la
+    caché supera `max_bytes` se eliminan las más viejas hasta volver por debajo del
+    límite.
+
+    No depende de nada fuera de la biblioteca estándar, así que cualquier scraper del
+    repo puede usarla (ver `scrapypi.get_categories`).
+    """
+
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        ttl: float = CACHE_TTL,
+        max_bytes: int = CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.html.gz")
+
+    def _entries(self):
+        """Lista (path, tamaño, fecha de escritura) de todas las entradas de la caché"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".html.gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, url: str, ignore_ttl: bool = False):
+        """Devuelve el HTML guardado para `url`, o None si no está o está vencido"""
+        path = self._path(url)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if self.ttl and age > self.ttl and not ignore_ttl:
+                return None
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                html = file.read()
+        except (FileNotFoundError, OSError, EOFError):
+            return None
+        return html
+
+    def put(self, url: str, html: str):
+        """Guarda el HTML de `url`, reemplazando la entrada anterior si existía"""
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escribimos a un archivo temporal y lo movemos, así un lector concurrente
+        # nunca ve una página a medio escribir
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+            file.write(html)
+        size = os.path.getsize(tmp_path)
+        try:
+            previous = os.path.getsize(path)
+        except FileNotFoundError:
+            previous = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry[1] for entry in self._entries())
+            else:
+                self._size += size - previous
+            if self.max_bytes and self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Borra las entradas vencidas y luego las más viejas hasta bajar del 90% del tope"""
+        now = time.time()
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(entry[1] for entry in entries)
+        for path, size, mtime in entries:
+            expired = self.ttl and now - mtime > self.ttl
+            if not expired and total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def evict_expired(self):
+        """Elimina todas las entradas vencidas de la caché"""
+        if not self.ttl:
+            return
+        now = time.time()
+        with self._lock:
+            for path, _, mtime in self._entries():
+                if now - mtime > self.ttl:
+                    os.remove(path)
+            self._size = None
+
+    def __contains__(self, url: str) -> bool:
+        return os.path.exists(self._path(url))
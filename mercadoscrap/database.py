@@ -1,23 +1,59 @@
 import os
-import pandas as pd
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice
 from sqlalchemy import (
+    Boolean,
     Column,
     Integer,
     String,
     Float,
     DateTime,
     ForeignKey,
+    Index,
+    PrimaryKeyConstraint,
+    Text,
+    bindparam,
     create_engine,
+    event,
+    func,
+    select,
+    update,
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship
 
+from metrics import get_metrics
+from prices import parse_price
+from sketch import PriceSketch
+
+# Base de datos por defecto (SQLite, en un archivo local)
+DB_URL = "sqlite:///mi_base_de_datos.db"
+
+# Productos por cada INSERT múltiple. Las búsquedas de claves existentes se hacen en
+# tandas de este tamaño para no pasar el límite de variables de SQLite.
+BATCH_SIZE = 500
 
 Base = declarative_base()
 
 
 class Producto(Base):
+    """Un producto (nombre y precio) de una categoría; se guarda una vez por clave.
+
+    A diferencia de `observaciones` y de la exportación a Parquet, `precio` sigue en
+    pesos (Float): es la tabla original y la base no se borra entre corridas, así que
+    las bases existentes ya la tienen en pesos. SQLite no cambia el tipo de una columna
+    sin reconstruir la tabla, y el índice único (nombre, precio) deduplica contra lo
+    ya guardado: con las dos unidades mezcladas el mismo producto se guardaría dos
+    veces. Los gráficos, `resumen_categorias` y `analytics.ipynb` también leen pesos.
+    El precio siempre se calcula como centavos / 100, así que `round(precio * 100)`
+    devuelve los centavos exactos.
+    """
+
     __tablename__ = "productos"
 
     id = Column(Integer, primary_key=True)
@@ -30,6 +66,11 @@ class Producto(Base):
 
     categoria = relationship("Categoria", back_populates="productos")
 
+    # Clave de deduplicación: el mismo producto con el mismo precio se guarda una vez
+    __table_args__ = (
+        Index("ix_productos_nombre_precio", "nombre", "precio", unique=True),
+    )
+
 
 class Categoria(Base):
     __tablename__ = "categorias"
@@ -40,64 +81,785 @@ class Categoria(Base):
     productos = relationship("Producto", back_populates="categoria")
 
 
+class Corrida(Base):
+    """Una ejecución del scraper. Cada observación de precio pertenece a una corrida."""
+
+    __tablename__ = "corridas"
+
+    id = Column(Integer, primary_key=True)
+    busqueda = Column(String)
+    inicio = Column(DateTime, default=datetime.utcnow, index=True)
+    fin = Column(DateTime)
+
+
+class CategoriaCorrida(Base):
+    """Checkpoint de una categoría dentro de una corrida"""
+
+    __tablename__ = "corrida_categorias"
+
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), primary_key=True)
+    categoria = Column(String, primary_key=True)
+    link = Column(String)
+    terminada = Column(Boolean, default=False, nullable=False)
+
+
+class PaginaCompletada(Base):
+    """Checkpoint de una página ya guardada (en la misma transacción que sus productos)"""
+
+    __tablename__ = "paginas_completadas"
+
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), nullable=False)
+    categoria = Column(String, nullable=False)
+    pagina = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("corrida_id", "categoria", "pagina"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+class Publicacion(Base):
+    """Una publicación de Mercado Libre, identificada por su id (MLA...)"""
+
+    __tablename__ = "publicaciones"
+
+    id = Column(Integer, primary_key=True)
+    item_id = Column(String, nullable=False, unique=True)
+    nombre = Column(String)
+    categoria_id = Column(Integer, ForeignKey("categorias.id"))
+    # Último precio observado, para escribir solo los cambios sin consultar el historial
+    ultimo_precio_centavos = Column(Integer)
+
+
+class Observacion(Base):
+    """Precio de una publicación en una corrida. Solo se guarda cuando el precio cambia."""
+
+    __tablename__ = "observaciones"
+
+    publicacion_id = Column(Integer, ForeignKey("publicaciones.id"), nullable=False)
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), nullable=False)
+    precio_centavos = Column(Integer, nullable=False)
+
+    # La clave primaria (publicación, corrida) sin rowid deja el historial de cada
+    # publicación contiguo en disco; el índice por corrida sirve para ver una corrida entera
+    __table_args__ = (
+        PrimaryKeyConstraint("publicacion_id", "corrida_id"),
+        Index("ix_observaciones_corrida", "corrida_id"),
+        {"sqlite_with_rowid": False},
+    )
+
+
+class ResumenCategoria(Base):
+    """Agregados de las filas agregadas a productos, por categoría y por la corrida que
+    las agregó.
+
+    Se actualiza en la misma transacción que los INSERT de productos, así los totales
+    por categoría se leen de acá sin recorrer la tabla productos: sumando todas las
+    corridas da lo que hay en la tabla. Un producto que ya estaba guardado no suma otra
+    vez, así que una corrida que vuelve a ver los mismos datos no agrega nada (lo que
+    vio cada corrida está en `ResumenCorrida`). `corrida_id` es 0 para lo guardado
+    fuera de una corrida (y para lo que ya había antes de esta tabla).
+    """
+
+    __tablename__ = "resumen_categorias"
+
+    categoria_id = Column(Integer, ForeignKey("categorias.id"), nullable=False)
+    corrida_id = Column(Integer, nullable=False, default=0)
+    cantidad = Column(Integer, nullable=False)
+    suma = Column(Float, nullable=False)
+    minimo = Column(Float)
+    maximo = Column(Float)
+    # Sketch de percentiles (ver `sketch.PriceSketch`), serializado como JSON
+    sketch = Column(Text, nullable=False)
+
+    __table_args__ = (PrimaryKeyConstraint("categoria_id", "corrida_id"),)
+
+
+class ResumenCorrida(Base):
+    """Agregados de todas las publicaciones que vio una corrida en cada categoría,
+    estuvieran o no guardadas de antes.
+
+    Tiene las mismas columnas que `ResumenCategoria` y se actualiza en la misma
+    transacción que los productos de cada tanda. Las corridas anteriores a esta tabla
+    no tienen filas.
+    """
+
+    __tablename__ = "resumen_corridas"
+
+    categoria_id = Column(Integer, ForeignKey("categorias.id"), nullable=False)
+    corrida_id = Column(Integer, ForeignKey("corridas.id"), nullable=False)
+    cantidad = Column(Integer, nullable=False)
+    suma = Column(Float, nullable=False)
+    minimo = Column(Float)
+    maximo = Column(Float)
+    # Sketch de percentiles (ver `sketch.PriceSketch`), serializado como JSON
+    sketch = Column(Text, nullable=False)
+
+    __table_args__ = (PrimaryKeyConstraint("categoria_id", "corrida_id"),)
+
+
+class PaginaVista(Base):
+    """Última versión vista de una página de resultados, para el modo vigilancia.
+
+    `huella` es el hash de las publicaciones de la página (ver `watch.fingerprint`);
+    `etag` y `last_modified` son los validadores HTTP para el próximo GET condicional.
+    """
+
+    __tablename__ = "paginas_vistas"
+
+    # Clave de la categoría vigilada ("búsqueda / categoría")
+    clave = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    etag = Column(String)
+    last_modified = Column(String)
+    huella = Column(String)
+    vista = Column(DateTime)
+
+    __table_args__ = (PrimaryKeyConstraint("clave", "url"),)
+
+
+class CategoriaVigilada(Base):
+    """Agenda de una categoría en el modo vigilancia (ver `watch.py`)"""
+
+    __tablename__ = "categorias_vigiladas"
+
+    clave = Column(String, primary_key=True)
+    busqueda = Column(String)
+    categoria = Column(String, nullable=False)
+    link = Column(String, nullable=False)
+    cantidad = Column(Integer)
+    # Revisiones seguidas en las que no cambió nada; duplican el intervalo
+    sin_cambios = Column(Integer, nullable=False, default=0)
+    # Minutos hasta la próxima revisión
+    intervalo = Column(Float)
+    proxima = Column(DateTime, nullable=False, index=True)
+    ultima_revision = Column(DateTime)
+    # Última vez que se recorrieron todas sus páginas
+    ultima_completa = Column(DateTime)
+
+
 def limpiar_precio(precio_str):
-    # Elimina el símbolo de moneda y separadores de miles
-    precio_limpio = (
-        precio_str.replace("$", "").replace(".", "").replace(",", ".").strip()
+    """Convierte un precio como "$1.234,50" a pesos (ver `prices.parse_price`)"""
+    return parse_price(precio_str) / 100
+
+
+def precio_a_centavos(precio) -> int:
+    """Centavos enteros de un precio con formato ("$1,234") o ya numérico (en centavos)"""
+    if isinstance(precio, str):
+        return parse_price(precio)
+    return int(precio)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(db_url: str = DB_URL):
+    """Devuelve un engine por URL, creando las tablas e índices la primera vez"""
+    with _engines_lock:
+        return _get_engine(db_url)
+
+
+def _get_engine(db_url):
+    engine = _engines.get(db_url)
+    if engine is None:
+        is_sqlite = make_url(db_url).get_backend_name() == "sqlite"
+        # Varias categorías pueden escribir a la vez: esperamos el lock en vez de fallar
+        engine = create_engine(
+            db_url, connect_args={"timeout": 60} if is_sqlite else {}
+        )
+        if is_sqlite:
+
+            @event.listens_for(engine, "connect")
+            def _sqlite_pragmas(dbapi_connection, connection_record):
+                # WAL: los lectores (por ejemplo el visualizador) no bloquean las escrituras
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.close()
+
+        Base.metadata.create_all(engine)
+        # create_all no agrega índices nuevos a tablas que ya existían
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+        with engine.begin() as conn:
+            backfill_summary(conn)
+        _engines[db_url] = engine
+    return engine
+
+
+@contextmanager
+def timed_batch(engine, filas: int, categoria: str):
+    """Transacción de una tanda de escritura, medida en las métricas compartidas.
+
+    El tiempo incluye el commit y queda en `db_batch_seconds`; las filas enviadas
+    suman a `db_rows_total` y la tanda se registra en el log estructurado.
+    """
+    metrics = get_metrics()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        yield conn
+    elapsed = time.perf_counter() - start
+    metrics.observe("db_batch_seconds", elapsed)
+    metrics.inc("db_rows_total", filas)
+    metrics.event("db_batch", categoria=categoria, filas=filas, segundos=elapsed)
+
+
+def get_or_create_categoria(conn, nombre: str) -> int:
+    """Devuelve el id de la categoría, insertándola si no existe"""
+    categoria_id = conn.execute(
+        select(Categoria.id).where(Categoria.nombre == nombre)
+    ).scalar()
+    if categoria_id is None:
+        categoria_id = conn.execute(
+            Categoria.__table__.insert().values(nombre=nombre)
+        ).inserted_primary_key[0]
+    return categoria_id
+
+
+def existing_keys(conn, nombres) -> set:
+    """Claves (nombre, precio) que ya están en la base para los nombres dados"""
+    nombres = list(nombres)
+    keys = set()
+    for start in range(0, len(nombres), BATCH_SIZE):
+        rows = conn.execute(
+            select(Producto.nombre, Producto.precio).where(
+                Producto.nombre.in_(nombres[start : start + BATCH_SIZE])
+            )
+        )
+        keys.update((nombre, precio) for nombre, precio in rows)
+    return keys
+
+
+def update_summary(
+    conn, categoria_id: int, corrida_id, precios, tabla=ResumenCategoria
+):
+    """Suma los precios al resumen de la categoría en la corrida.
+
+    Por defecto es `ResumenCategoria` (los precios recién insertados en productos);
+    con `tabla=ResumenCorrida`, el de lo que vio la corrida.
+    """
+    precios = list(precios)
+    if not precios:
+        return
+    corrida_id = corrida_id or 0
+    # La transacción ya escribió productos, así que tiene el lock de escritura y nadie
+    # más puede modificar el sketch entre esta lectura y el upsert
+    anterior = conn.execute(
+        select(tabla.sketch)
+        .where(tabla.categoria_id == categoria_id)
+        .where(tabla.corrida_id == corrida_id)
+    ).scalar()
+    sketch = PriceSketch.from_json(anterior) if anterior else PriceSketch()
+    sketch.update(precios)
+
+    stmt = sqlite_insert(tabla).values(
+        categoria_id=categoria_id,
+        corrida_id=corrida_id,
+        cantidad=len(precios),
+        suma=sum(precios),
+        minimo=min(precios),
+        maximo=max(precios),
+        sketch=sketch.to_json(),
     )
-    return float(precio_limpio.replace(".", "").replace(",", "."))
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["categoria_id", "corrida_id"],
+            set_={
+                "cantidad": tabla.cantidad + stmt.excluded.cantidad,
+                "suma": tabla.suma + stmt.excluded.suma,
+                "minimo": func.min(tabla.minimo, stmt.excluded.minimo),
+                "maximo": func.max(tabla.maximo, stmt.excluded.maximo),
+                "sketch": stmt.excluded.sketch,
+            },
+        )
+    )
+
+
+def backfill_summary(conn):
+    """Arma el resumen de los productos guardados antes de que existiera la tabla.
 
+    Solo hace algo si el resumen está vacío y hay productos; todo queda en la
+    corrida 0. Los precios se leen ordenados por categoría y de a tandas.
+    """
+    if conn.execute(select(ResumenCategoria.categoria_id).limit(1)).first():
+        return
+    if not conn.execute(select(Producto.id).limit(1)).first():
+        return
+
+    rows = conn.execution_options(yield_per=BATCH_SIZE * 10).execute(
+        select(Producto.categoria_id, Producto.precio)
+        .where(Producto.categoria_id.is_not(None))
+        .where(Producto.precio.is_not(None))
+        .order_by(Producto.categoria_id)
+    )
+    actual, precios = None, []
+    for categoria_id, precio in rows:
+        if categoria_id != actual:
+            update_summary(conn, actual, 0, precios)
+            actual, precios = categoria_id, []
+        precios.append(precio)
+    update_summary(conn, actual, 0, precios)
 
-def insert_data(datadict):
-    # Crear el motor de base de datos (en este caso, usando SQLite y creando un archivo local)
-    engine = create_engine("sqlite:///mi_base_de_datos.db")
 
-    # Crear las tablas en la base de datos
-    Base.metadata.create_all(engine)
+def insert_productos(conn, categoria_id: int, keys, corrida_id: int = None):
+    """Inserta las claves (nombre, precio) que todavía no están en la tabla productos
+    y las suma al resumen de la categoría (ver `ResumenCategoria`). Con `corrida_id`,
+    todas las claves de la tanda, nuevas o no, suman a lo que vio la corrida (ver
+    `ResumenCorrida`)."""
+    keys = list(keys)
+    if corrida_id is not None:
+        update_summary(
+            conn,
+            categoria_id,
+            corrida_id,
+            (precio for _, precio in keys),
+            tabla=ResumenCorrida,
+        )
+    # Evitar duplicados de producto y precio, dentro de la tanda y en la base
+    keys = dict.fromkeys(keys)
+    known = existing_keys(conn, {nombre for nombre, _ in keys})
+    batch = [
+        {"nombre": nombre, "precio": precio, "categoria_id": categoria_id}
+        for nombre, precio in keys
+        if (nombre, precio) not in known
+    ]
+    if batch:
+        # RETURNING solo devuelve las filas insertadas: si otra categoría guardó la
+        # misma clave mientras tanto, el conflicto no se cuenta en el resumen
+        inserted = conn.execute(
+            sqlite_insert(Producto).on_conflict_do_nothing().returning(Producto.precio),
+            batch,
+        ).scalars()
+        update_summary(conn, categoria_id, corrida_id, inserted)
+
+
+def start_run(busqueda: str = "", db_url: str = DB_URL) -> int:
+    """Registra una nueva corrida del scraper y devuelve su id"""
+    with get_engine(db_url).begin() as conn:
+        return conn.execute(
+            Corrida.__table__.insert().values(
+                busqueda=busqueda, inicio=datetime.utcnow()
+            )
+        ).inserted_primary_key[0]
+
 
-    # Crear una sesión para interactuar con la base de datos
-    Session = sessionmaker(bind=engine)
-    session = Session()
+def finish_run(corrida_id: int, db_url: str = DB_URL):
+    """Marca la corrida como terminada"""
+    with get_engine(db_url).begin() as conn:
+        conn.execute(
+            update(Corrida)
+            .where(Corrida.id == corrida_id)
+            .values(fin=datetime.utcnow())
+        )
+
+
+def record_observations(conn, observaciones, categoria_id: int, corrida_id: int):
+    """Guarda las observaciones [(item_id, nombre, precio_centavos)] de una corrida.
+
+    Las publicaciones nuevas se insertan y, de las que ya existían, solo se escribe una
+    observación si el precio cambió desde la última vez que se vieron.
+    """
+    precios = {}
+    nombres = {}
+    for item_id, nombre, precio_centavos in observaciones:
+        precios.setdefault(item_id, precio_centavos)
+        nombres.setdefault(item_id, nombre)
+    item_ids = list(precios)
+
+    known = {}
+    for start in range(0, len(item_ids), BATCH_SIZE):
+        rows = conn.execute(
+            select(
+                Publicacion.item_id, Publicacion.id, Publicacion.ultimo_precio_centavos
+            ).where(Publicacion.item_id.in_(item_ids[start : start + BATCH_SIZE]))
+        )
+        known.update((item_id, (id_, ultimo)) for item_id, id_, ultimo in rows)
+
+    nuevas = [item_id for item_id in item_ids if item_id not in known]
+    if nuevas:
+        conn.execute(
+            sqlite_insert(Publicacion).on_conflict_do_nothing(),
+            [
+                {
+                    "item_id": item_id,
+                    "nombre": nombres[item_id],
+                    "categoria_id": categoria_id,
+                }
+                for item_id in nuevas
+            ],
+        )
+        for start in range(0, len(nuevas), BATCH_SIZE):
+            rows = conn.execute(
+                select(Publicacion.item_id, Publicacion.id).where(
+                    Publicacion.item_id.in_(nuevas[start : start + BATCH_SIZE])
+                )
+            )
+            known.update((item_id, (id_, None)) for item_id, id_ in rows)
+
+    cambios = [
+        {"b_id": known[item_id][0], "b_precio": precio}
+        for item_id, precio in precios.items()
+        if known[item_id][1] != precio
+    ]
+    if not cambios:
+        return
+    conn.execute(
+        sqlite_insert(Observacion).on_conflict_do_nothing(),
+        [
+            {
+                "publicacion_id": cambio["b_id"],
+                "corrida_id": corrida_id,
+                "precio_centavos": cambio["b_precio"],
+            }
+            for cambio in cambios
+        ],
+    )
+    conn.execute(
+        update(Publicacion)
+        .where(Publicacion.id == bindparam("b_id"))
+        .values(ultimo_precio_centavos=bindparam("b_precio")),
+        cambios,
+    )
+
+
+def insert_data(
+    datadict,
+    db_url: str = DB_URL,
+    batch_size: int = BATCH_SIZE,
+    corrida_id: int = None,
+):
+    """Guarda {categoría: {producto: {"Precio": [...], "Id": [...]}}} en la base.
+
+    Los precios van en centavos enteros, como los devuelve `scrape_all_pages` (también
+    se aceptan textos con formato, como "$1.234,50").
+
+    Cada categoría se escribe en una sola transacción: se descartan las claves
+    (nombre, precio) repetidas o ya guardadas y el resto va en INSERTs múltiples
+    con `ON CONFLICT DO NOTHING`, junto con su resumen en `resumen_categorias`. Si
+    se pasa `corrida_id`, los productos que traen "Id" también se agregan al
+    historial de precios (ver `record_observations`).
+    """
+    engine = get_engine(db_url)
 
-    # Insertar categorías y productos
     for categoria_nombre, productos in datadict.items():
-        categoria = session.query(Categoria).filter_by(nombre=categoria_nombre).first()
-        if not categoria:
-            categoria = Categoria(nombre=categoria_nombre)
-            session.add(categoria)
-            session.commit()
-
-        for producto_nombre, info in productos.items():
-            # Evitar duplicados de producto y precio
-            precio = info["Precio"][0]
-            precio_limpio = limpiar_precio(precio)
-
-            producto_existente = (
-                session.query(Producto)
-                .filter_by(nombre=producto_nombre, precio=precio_limpio)
-                .first()
+        with timed_batch(engine, len(productos), categoria_nombre) as conn:
+            categoria_id = get_or_create_categoria(conn, categoria_nombre)
+
+            items = list(productos.items())
+            for start in range(0, len(items), batch_size):
+                chunk = items[start : start + batch_size]
+                insert_productos(
+                    conn,
+                    categoria_id,
+                    (
+                        (producto_nombre, precio_a_centavos(info["Precio"][0]) / 100)
+                        for producto_nombre, info in chunk
+                    ),
+                    corrida_id,
+                )
+
+                if corrida_id is not None:
+                    observaciones = [
+                        (item_id, producto_nombre, precio_a_centavos(precio))
+                        for producto_nombre, info in chunk
+                        for item_id, precio in zip(info.get("Id", []), info["Precio"])
+                        if item_id
+                    ]
+                    if observaciones:
+                        record_observations(
+                            conn, observaciones, categoria_id, corrida_id
+                        )
+
+
+def write_listings(conn, categoria_id: int, listings, corrida_id: int = None):
+    """Guarda una tanda de `Listing` (con precio en centavos) en productos y, si hay
+    corrida, en el historial"""
+    insert_productos(
+        conn,
+        categoria_id,
+        ((listing.title.strip(), listing.price / 100) for listing in listings),
+        corrida_id,
+    )
+    if corrida_id is not None:
+        observaciones = [
+            (listing.item_id, listing.title.strip(), listing.price)
+            for listing in listings
+            if listing.item_id
+        ]
+        if observaciones:
+            record_observations(conn, observaciones, categoria_id, corrida_id)
+
+
+def insert_listings(
+    categoria_nombre: str,
+    listings,
+    db_url: str = DB_URL,
+    batch_size: int = BATCH_SIZE,
+    corrida_id: int = None,
+) -> int:
+    """Guarda un iterable de `Listing` a medida que llega, en tandas de `batch_size`.
+
+    Cada tanda es una transacción, así lo ya scrapeado queda guardado aunque la corrida
+    se corte y la memoria no depende del tamaño de la categoría. Devuelve cuántas
+    publicaciones se procesaron.
+    """
+    engine = get_engine(db_url)
+    with engine.begin() as conn:
+        categoria_id = get_or_create_categoria(conn, categoria_nombre)
+
+    listings = iter(listings)
+    total = 0
+    while True:
+        batch = list(islice(listings, batch_size))
+        if not batch:
+            return total
+        with timed_batch(engine, len(batch), categoria_nombre) as conn:
+            write_listings(conn, categoria_id, batch, corrida_id)
+        total += len(batch)
+
+
+def insert_pages(
+    categoria_nombre: str,
+    pages,
+    corrida_id: int,
+    db_url: str = DB_URL,
+    batch_size: int = BATCH_SIZE,
+    checkpoint: str = None,
+) -> int:
+    """Como `insert_listings`, pero recibe páginas (número, URL, [Listing]) y deja
+    un checkpoint de cada página en la misma transacción que sus productos.
+
+    Las tandas se cortan siempre al final de una página, así una página figura como
+    completada si y solo si sus productos ya están guardados. Los checkpoints van a
+    nombre de `checkpoint` (por defecto, la categoría); sirve para separar las páginas
+    de cada rango de precio de una categoría partida.
+    """
+    engine = get_engine(db_url)
+    with engine.begin() as conn:
+        categoria_id = get_or_create_categoria(conn, categoria_nombre)
+
+    def flush(batch, done):
+        with timed_batch(engine, len(batch), categoria_nombre) as conn:
+            if batch:
+                write_listings(conn, categoria_id, batch, corrida_id)
+            conn.execute(
+                sqlite_insert(PaginaCompletada).on_conflict_do_nothing(),
+                [
+                    {
+                        "corrida_id": corrida_id,
+                        "categoria": checkpoint or categoria_nombre,
+                        "pagina": p,
+                    }
+                    for p in done
+                ],
             )
 
-            if not producto_existente:
-                # Insertar el producto con el primer precio
-                nuevo_producto = Producto(
-                    nombre=producto_nombre, precio=precio_limpio, categoria=categoria
+    total = 0
+    batch, done = [], []
+    for page, _, listings in pages:
+        batch.extend(listings)
+        done.append(page)
+        if len(batch) >= batch_size:
+            flush(batch, done)
+            total += len(batch)
+            batch, done = [], []
+    if done:
+        flush(batch, done)
+        total += len(batch)
+    return total
+
+
+def start_category(corrida_id: int, categoria: str, link: str, db_url: str = DB_URL):
+    """Registra que la corrida empezó a scrapear una categoría"""
+    with get_engine(db_url).begin() as conn:
+        conn.execute(
+            sqlite_insert(CategoriaCorrida).on_conflict_do_nothing(),
+            {"corrida_id": corrida_id, "categoria": categoria, "link": link},
+        )
+
+
+def finish_category(corrida_id: int, categoria: str, db_url: str = DB_URL):
+    """Marca la categoría como terminada dentro de la corrida"""
+    with get_engine(db_url).begin() as conn:
+        conn.execute(
+            update(CategoriaCorrida)
+            .where(CategoriaCorrida.corrida_id == corrida_id)
+            .where(CategoriaCorrida.categoria == categoria)
+            .values(terminada=True)
+        )
+
+
+def completed_categories(corrida_id: int, db_url: str = DB_URL) -> set:
+    """Nombres de las categorías que la corrida ya terminó"""
+    with get_engine(db_url).connect() as conn:
+        return set(
+            conn.execute(
+                select(CategoriaCorrida.categoria)
+                .where(CategoriaCorrida.corrida_id == corrida_id)
+                .where(CategoriaCorrida.terminada.is_(True))
+            ).scalars()
+        )
+
+
+def completed_pages(corrida_id: int, categoria: str, db_url: str = DB_URL) -> set:
+    """Números de página de la categoría que ya están guardados en la corrida"""
+    with get_engine(db_url).connect() as conn:
+        return set(
+            conn.execute(
+                select(PaginaCompletada.pagina)
+                .where(PaginaCompletada.corrida_id == corrida_id)
+                .where(PaginaCompletada.categoria == categoria)
+            ).scalars()
+        )
+
+
+def last_unfinished_run(busqueda: str, db_url: str = DB_URL):
+    """Id de la última corrida sin terminar para la búsqueda, o None"""
+    with get_engine(db_url).connect() as conn:
+        return conn.execute(
+            select(Corrida.id)
+            .where(Corrida.busqueda == busqueda)
+            .where(Corrida.fin.is_(None))
+            .order_by(Corrida.id.desc())
+            .limit(1)
+        ).scalar()
+
+
+def price_history(item_id: str, db_url: str = DB_URL):
+    """Devuelve [(fecha de la corrida, precio en centavos)] de una publicación"""
+    with get_engine(db_url).connect() as conn:
+        rows = conn.execute(
+            select(Corrida.inicio, Observacion.precio_centavos)
+            .join(Corrida, Corrida.id == Observacion.corrida_id)
+            .join(Publicacion, Publicacion.id == Observacion.publicacion_id)
+            .where(Publicacion.item_id == item_id)
+            .order_by(Observacion.corrida_id)
+        )
+        return [tuple(row) for row in rows]
+
+
+def page_states(clave: str, db_url: str = DB_URL) -> dict:
+    """{URL: (etag, last_modified, huella)} de las páginas vistas de una categoría
+    vigilada"""
+    with get_engine(db_url).connect() as conn:
+        rows = conn.execute(
+            select(
+                PaginaVista.url,
+                PaginaVista.etag,
+                PaginaVista.last_modified,
+                PaginaVista.huella,
+            ).where(PaginaVista.clave == clave)
+        )
+        return {
+            url: (etag, last_modified, huella)
+            for url, etag, last_modified, huella in rows
+        }
+
+
+def save_page_states(clave: str, states: dict, db_url: str = DB_URL):
+    """Guarda {URL: (etag, last_modified, huella)} de una categoría vigilada"""
+    if not states:
+        return
+    vista = datetime.utcnow()
+    stmt = sqlite_insert(PaginaVista)
+    with get_engine(db_url).begin() as conn:
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["clave", "url"],
+                set_={
+                    "etag": stmt.excluded.etag,
+                    "last_modified": stmt.excluded.last_modified,
+                    "huella": stmt.excluded.huella,
+                    "vista": stmt.excluded.vista,
+                },
+            ),
+            [
+                {
+                    "clave": clave,
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "huella": huella,
+                    "vista": vista,
+                }
+                for url, (etag, last_modified, huella) in states.items()
+            ],
+        )
+
+
+def register_watched(categorias: dict, db_url: str = DB_URL):
+    """Agrega las categorías {clave: {"busqueda", "categoria", "link", "cantidad"}} a
+    la agenda del modo vigilancia, para revisarlas ya. Las que ya estaban solo
+    actualizan su link y su cantidad, sin perder su agenda."""
+    if not categorias:
+        return
+    stmt = sqlite_insert(CategoriaVigilada)
+    with get_engine(db_url).begin() as conn:
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["clave"],
+                set_={"link": stmt.excluded.link, "cantidad": stmt.excluded.cantidad},
+            ),
+            [
+                {
+                    "clave": clave,
+                    "busqueda": info.get("busqueda"),
+                    "categoria": info["categoria"],
+                    "link": info["link"],
+                    "cantidad": info.get("cantidad"),
+                    "sin_cambios": 0,
+                    "proxima": datetime.utcnow(),
+                }
+                for clave, info in categorias.items()
+            ],
+        )
+
+
+def watched_categories(claves, db_url: str = DB_URL) -> dict:
+    """{clave: fila como dict} de las categorías vigiladas con esas claves"""
+    claves = list(claves)
+    with get_engine(db_url).connect() as conn:
+        return {
+            row["clave"]: dict(row)
+            for start in range(0, len(claves), BATCH_SIZE)
+            for row in conn.execute(
+                select(CategoriaVigilada).where(
+                    CategoriaVigilada.clave.in_(claves[start : start + BATCH_SIZE])
                 )
-                session.add(nuevo_producto)
+            ).mappings()
+        }
+
 
-        session.commit()
+def save_watched(fila: dict, db_url: str = DB_URL):
+    """Guarda la agenda de una categoría vigilada después de revisarla"""
+    with get_engine(db_url).begin() as conn:
+        conn.execute(
+            update(CategoriaVigilada)
+            .where(CategoriaVigilada.clave == fila["clave"])
+            .values(
+                sin_cambios=fila["sin_cambios"],
+                intervalo=fila["intervalo"],
+                proxima=fila["proxima"],
+                ultima_revision=fila["ultima_revision"],
+                ultima_completa=fila["ultima_completa"],
+            )
+        )
 
 
 def convert_to_dataframes(datadict):
+    import pandas as pd
+
     dfs = {}
     for category, products in datadict.items():
-        # Crear un DataFrame para cada categoría
-        category_data = []
+        # Crear un DataFrame para cada categoría, armado por columnas
+        productos = []
+        precios = []
         for product, details in products.items():
-            for price in details["Precio"]:
-                category_data.append({"Producto": product, "Precio": price})
+            productos.extend([product] * len(details["Precio"]))
+            precios.extend(details["Precio"])
 
-        df = pd.DataFrame(category_data)
-        dfs[category] = df
+        dfs[category] = pd.DataFrame({"Producto": productos, "Precio": precios})
 
     return dfs
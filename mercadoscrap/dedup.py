@@ -0,0 +1,136 @@
+import hashlib
+import math
+import threading
+
+# Ids que se guardan exactos; pasado este número el índice cambia a un filtro de Bloom
+EXACT_LIMIT = 1_000_000
+
+# Ids que el filtro de Bloom aguanta con la tasa de falsos positivos pedida
+BLOOM_CAPACITY = 10_000_000
+
+# Probabilidad de que el filtro de Bloom tome por repetida una publicación nueva
+BLOOM_ERROR_RATE = 1e-4
+
+
+def compact_id(item_id: str):
+    """El id "MLA123456" como el entero 123456, que ocupa mucho menos en un set"""
+    digits = item_id[3:]
+    return int(digits) if item_id.startswith("MLA") and digits.isdigit() else item_id
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre un `bytearray`, dimensionado para `capacity` claves con una
+    tasa de falsos positivos de `error_rate`.
+
+    Nunca da falsos negativos: una clave agregada siempre aparece como vista.
+    """
+
+    def __init__(
+        self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE
+    ):
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Doble hashing: las k posiciones salen de dos hashes de 64 bits
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key) -> bool:
+        """Agrega `key` y devuelve True si no estaba"""
+        new = False
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                new = True
+        return new
+
+    def __contains__(self, key) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class ListingIndex:
+    """
+    Publicaciones ya vistas en una corrida, por id (MLA...).
+
+    La misma publicación aparece en la búsqueda y en varias subcategorías; el índice
+    se comparte entre todas las categorías de la corrida para que solo la primera que
+    la encuentra la guarde. Los ids se guardan exactos (como enteros) hasta
+    `exact_limit`; después se pasan a un `BloomFilter`, que ocupa una fracción de la
+    memoria a cambio de descartar alguna publicación nueva con probabilidad
+    `error_rate`. Se puede usar desde varios hilos a la vez.
+    """
+
+    def __init__(
+        self,
+        exact_limit: int = EXACT_LIMIT,
+        capacity: int = BLOOM_CAPACITY,
+        error_rate: float = BLOOM_ERROR_RATE,
+    ):
+        self.exact_limit = exact_limit
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.unique = 0
+        self.duplicates = 0
+        self._ids = set()
+        self._bloom = None
+        self._lock = threading.Lock()
+
+    def _add(self, item_id) -> bool:
+        key = compact_id(item_id)
+        if self._bloom is not None:
+            return self._bloom.add(key)
+        if key in self._ids:
+            return False
+        self._ids.add(key)
+        if len(self._ids) > self.exact_limit:
+            self._bloom = BloomFilter(self.capacity, self.error_rate)
+            for seen in self._ids:
+                self._bloom.add(seen)
+            self._ids = set()
+        return True
+
+    def add(self, item_id: str) -> bool:
+        """Registra `item_id` y devuelve True si es la primera vez que se ve"""
+        with self._lock:
+            new = self._add(item_id)
+            if new:
+                self.unique += 1
+            else:
+                self.duplicates += 1
+            return new
+
+    def filter(self, listings) -> list:
+        """Los `Listing` que todavía no se habían visto (y los que no tienen id)"""
+        with self._lock:
+            new = [
+                listing
+                for listing in listings
+                if listing.item_id is None or self._add(listing.item_id)
+            ]
+            with_id = sum(listing.item_id is not None for listing in new)
+            self.unique += with_id
+            self.duplicates += len(listings) - len(new)
+            return new
+
+    @property
+    def approximate(self) -> bool:
+        """True si el índice ya pasó al filtro de Bloom"""
+        return self._bloom is not None
+
+    def summary(self) -> dict:
+        return {
+            "unicas": self.unique,
+            "repetidas": self.duplicates,
+            "bloom": self.approximate,
+        }
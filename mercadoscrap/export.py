@@ -0,0 +1,211 @@
+"""
+Exportación de las corridas a Parquet, para analizar muchas corridas sin pasar por SQLite.
+
+Cada corrida se escribe como un dataset particionado al estilo Hive por categoría y
+fecha (`<directorio>/categoria=<nombre>/fecha=<AAAA-MM-DD>/corrida-<id>-....parquet`),
+con columnas tipadas: precios en centavos enteros y nombres con dictionary encoding.
+`load_runs` lee solo las columnas y particiones pedidas.
+
+Necesita pyarrow, que se importa recién al exportar o leer.
+"""
+
+import threading
+import uuid
+from datetime import date, datetime
+
+from database import precio_a_centavos
+
+# Carpeta por defecto del dataset Parquet
+EXPORT_DIR = "exports/parquet"
+
+# Filas que se juntan antes de escribir un archivo en el exportador por tandas
+ROWS_PER_FILE = 100_000
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError(
+            "La exportación a Parquet necesita pyarrow "
+            "(poetry install --extras parquet, o pip install pyarrow)."
+        ) from error
+    return pa, ds, pq
+
+
+def _schema(pa):
+    return pa.schema(
+        [
+            ("corrida_id", pa.int64()),
+            ("item_id", pa.string()),
+            ("nombre", pa.dictionary(pa.int32(), pa.string())),
+            ("precio_centavos", pa.int64()),
+            ("categoria", pa.dictionary(pa.int32(), pa.string())),
+            ("fecha", pa.date32()),
+        ]
+    )
+
+
+def _partitioning(pa, ds):
+    return ds.partitioning(
+        pa.schema([("categoria", pa.string()), ("fecha", pa.date32())]),
+        flavor="hive",
+    )
+
+
+class RunExporter:
+    """
+    Escribe las publicaciones de una corrida a medida que llegan.
+
+    `add(categoria, listings)` acumula columnas (no diccionarios por fila) y cada
+    `rows_per_file` filas escribe un archivo nuevo en las particiones que
+    correspondan. Se puede usar desde varios hilos a la vez; `close()` escribe lo que
+    quede pendiente.
+    """
+
+    def __init__(
+        self,
+        corrida_id: int,
+        directory: str = EXPORT_DIR,
+        fecha: date = None,
+        rows_per_file: int = ROWS_PER_FILE,
+    ):
+        self.corrida_id = corrida_id
+        self.directory = directory
+        self.fecha = fecha or datetime.utcnow().date()
+        self.rows_per_file = rows_per_file
+        self.rows = 0
+        self._files = 0
+        # Al retomar una corrida se crea otro exportador: los archivos no se pisan
+        self._token = uuid.uuid4().hex[:8]
+        self._columns = {"item_id": [], "nombre": [], "precio": [], "categoria": []}
+        self._lock = threading.Lock()
+        # Falla acá y no después de scrapear si pyarrow no está instalado
+        _pyarrow()
+
+    def add(self, categoria: str, listings):
+        """Agrega una tanda de `Listing` (con precio) de la categoría"""
+        with self._lock:
+            columns = self._columns
+            for listing in listings:
+                columns["item_id"].append(listing.item_id)
+                columns["nombre"].append(listing.title.strip())
+                columns["precio"].append(listing.price)
+                columns["categoria"].append(categoria)
+            if len(columns["precio"]) >= self.rows_per_file:
+                self._flush()
+
+    def add_datadict(self, datadict):
+        """Agrega {categoría: {producto: {"Precio": [...], "Id": [...]}}} completo"""
+        with self._lock:
+            columns = self._columns
+            for categoria, productos in datadict.items():
+                for nombre, info in productos.items():
+                    precios = info["Precio"]
+                    ids = info.get("Id") or [None] * len(precios)
+                    for item_id, precio in zip(ids, precios):
+                        columns["item_id"].append(item_id)
+                        columns["nombre"].append(nombre)
+                        columns["precio"].append(precio_a_centavos(precio))
+                        columns["categoria"].append(categoria)
+            self._flush()
+
+    def _flush(self):
+        columns = self._columns
+        count = len(columns["precio"])
+        if not count:
+            return
+        pa, ds, _ = _pyarrow()
+        table = pa.table(
+            {
+                "corrida_id": pa.array([self.corrida_id] * count, pa.int64()),
+                "item_id": pa.array(columns["item_id"], pa.string()),
+                "nombre": pa.array(columns["nombre"], pa.string()).dictionary_encode(),
+                "precio_centavos": pa.array(columns["precio"], pa.int64()),
+                "categoria": pa.array(
+                    columns["categoria"], pa.string()
+                ).dictionary_encode(),
+                "fecha": pa.array([self.fecha] * count, pa.date32()),
+            },
+            schema=_schema(pa),
+        )
+        ds.write_dataset(
+            table,
+            self.directory,
+            format="parquet",
+            partitioning=_partitioning(pa, ds),
+            basename_template=(
+                f"corrida-{self.corrida_id}-{self._token}-{self._files}-{{i}}.parquet"
+            ),
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        self._files += 1
+        self.rows += count
+        self._columns = {name: [] for name in columns}
+
+    def close(self):
+        with self._lock:
+            self._flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_datadict(
+    datadict, corrida_id: int, directory: str = EXPORT_DIR, fecha: date = None
+) -> int:
+    """Exporta el resultado de `scrape_all_pages` de una corrida. Devuelve las filas."""
+    exporter = RunExporter(corrida_id, directory, fecha)
+    exporter.add_datadict(datadict)
+    return exporter.rows
+
+
+def load_runs(
+    directory: str = EXPORT_DIR,
+    columns=None,
+    categorias=None,
+    desde: date = None,
+    hasta: date = None,
+    corridas=None,
+    memory_map: bool = True,
+):
+    """
+    Lee el dataset exportado como un DataFrame.
+
+    Solo se leen las `columns` pedidas (todas si es None) y las particiones de las
+    `categorias` y fechas entre `desde` y `hasta` (inclusive); el resto de los
+    archivos ni se abre. Con `corridas` se filtra además por id de corrida. Los
+    archivos se leen con memory map, así las columnas que no cambian de tipo no se
+    copian. Los nombres y las categorías quedan como columnas categóricas.
+    """
+    pa, ds, pq = _pyarrow()
+
+    filters = []
+    if categorias is not None:
+        filters.append(("categoria", "in", list(categorias)))
+    if desde is not None:
+        filters.append(("fecha", ">=", desde))
+    if hasta is not None:
+        filters.append(("fecha", "<=", hasta))
+    if corridas is not None:
+        filters.append(("corrida_id", "in", list(corridas)))
+
+    table = pq.read_table(
+        directory,
+        columns=list(columns) if columns is not None else None,
+        filters=filters or None,
+        partitioning=_partitioning(pa, ds),
+        memory_map=memory_map,
+    )
+    # La categoría sale del nombre de la carpeta como texto plano
+    if "categoria" in table.column_names:
+        index = table.column_names.index("categoria")
+        table = table.set_column(
+            index, "categoria", table.column(index).dictionary_encode()
+        )
+    return table.to_pandas()
@@ -0,0 +1,251 @@
+import random
+import threading
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+
+import requests  # 🕸️ Solicitudes HTTP
+from requests.adapters import HTTPAdapter
+
+from metrics import get_metrics
+from ratelimit import AdaptiveController, parse_retry_after
+
+# Timeout por solicitud (en segundos), el mismo que usábamos con requests.get
+TIMEOUT = 300
+
+# Reintentos por URL antes de darla por perdida
+MAX_RETRIES = 3
+
+# Backoff exponencial con jitter: la espera del intento n es aleatoria en
+# [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n)]
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# Conexiones keep-alive que se mantienen abiertas por host
+POOL_SIZE = 16
+
+# Códigos HTTP que vale la pena reintentar
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Registro de cada solicitud: cuánto tardó y cuántos intentos hicieron falta
+RequestTiming = namedtuple("RequestTiming", ["url", "status", "elapsed", "attempts"])
+
+# Resultado de un GET condicional; `html` es None si el servidor contestó 304
+ConditionalResponse = namedtuple(
+    "ConditionalResponse", ["html", "etag", "last_modified"]
+)
+
+
+class CacheMiss(requests.exceptions.RequestException):
+    """En modo replay se pidió una URL que no está en la caché"""
+
+
+class Fetcher:
+    """
+    Cliente HTTP compartido para todo el scraping.
+
+    Usa una única `requests.Session` con un pool de conexiones keep-alive, así las
+    páginas de un mismo host reutilizan la conexión TCP/TLS. Los errores de red y las
+    respuestas en `RETRY_STATUS` se reintentan hasta `max_retries` veces con backoff
+    exponencial y jitter. Cada solicitud queda registrada en `timings` y en las
+    métricas compartidas (ver `metrics.get_metrics`).
+
+    Cada intento pasa por un `ratelimit.AdaptiveController` (con `adaptive=False` no),
+    que ajusta por host cuántas solicitudes van en paralelo según los 429/503, la
+    latencia y el header Retry-After, y acorta el timeout según la latencia observada.
+
+    Si se le pasa una `cache` (ver `cache.HtmlCache`) el HTML se sirve desde disco
+    cuando está vigente y se guarda después de cada descarga exitosa. Con `replay=True`
+    nunca se sale a la red: todo se sirve desde la caché (aunque esté vencida) y las
+    URLs que faltan lanzan `CacheMiss`.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        timeout: float = TIMEOUT,
+        cache=None,
+        replay: bool = False,
+        adaptive: bool = True,
+    ):
+        if replay and cache is None:
+            raise ValueError("El modo replay necesita una caché.")
+        self.cache = cache
+        self.replay = replay
+        self.cache_hits = 0
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.controller = AdaptiveController() if adaptive else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Segundos a esperar antes del reintento número `attempt` (full jitter)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def get(self, url: str, limiter=None, **kwargs) -> requests.Response:
+        """Hace un GET con reintentos. Lanza la última excepción si se agotan los intentos.
+
+        Con un `limiter` (por ejemplo un `threading.Semaphore` compartido por varias
+        categorías) cada intento ocupa un lugar solo mientras la solicitud está en
+        vuelo: se libera antes de esperar el backoff o el lugar del host.
+        """
+        host = self.controller.host(url) if self.controller is not None else None
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            try:
+                response = self._attempt(host, url, kwargs, limiter)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    self._record(url, None, start, attempt + 1)
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or (
+                    attempt >= self.max_retries
+                ):
+                    self._record(url, response.status_code, start, attempt + 1)
+                    return response
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def _attempt(self, host, url: str, kwargs, limiter=None) -> requests.Response:
+        """Un intento de GET, dentro del límite adaptativo del host si hay uno"""
+        if host is None:
+            with limiter or nullcontext():
+                return self.session.get(url, **{"timeout": self.timeout, **kwargs})
+
+        sent_at = host.acquire()
+        started = time.perf_counter()
+        status = retry_after = None
+        try:
+            with limiter or nullcontext():
+                started = time.perf_counter()
+                response = self.session.get(
+                    url, **{"timeout": host.timeout(self.timeout), **kwargs}
+                )
+            status = response.status_code
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            return response
+        finally:
+            host.release(sent_at, status, time.perf_counter() - started, retry_after)
+
+    def get_text(self, url: str, limiter=None, **kwargs) -> str:
+        """Devuelve el HTML de `url`, desde la caché si se puede o descargándolo (con
+        `limiter`, ver `get`)"""
+        if self.cache is not None:
+            html = self.cache.get(url, ignore_ttl=self.replay)
+            if html is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                get_metrics().inc("cache_hits_total")
+                return html
+            if self.replay:
+                raise CacheMiss(f"{url} no está en la caché (modo replay)")
+
+        response = self.get(url, limiter=limiter, **kwargs)
+        html = response.text
+        get_metrics().inc("fetch_bytes_total", len(response.content))
+        if self.cache is not None and response.ok:
+            self.cache.put(url, html)
+        return html
+
+    def get_conditional(
+        self,
+        url: str,
+        etag: str = None,
+        last_modified: str = None,
+        limiter=None,
+        **kwargs,
+    ) -> ConditionalResponse:
+        """GET condicional con los validadores de la última versión vista de `url`.
+
+        Manda If-None-Match / If-Modified-Since si se pasan; si el servidor contesta 304
+        el HTML viene None y se mantienen los validadores. No lee la caché (se quiere la
+        versión actual), pero guarda en ella lo descargado; en modo replay sirve la
+        caché sin validadores. Lanza `requests.HTTPError` si la respuesta es un error.
+        """
+        if self.replay:
+            return ConditionalResponse(self.get_text(url, limiter), None, None)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = self.get(url, limiter=limiter, headers=headers, **kwargs)
+        if response.status_code == 304:
+            return ConditionalResponse(None, etag, last_modified)
+        response.raise_for_status()
+        html = response.text
+        get_metrics().inc("fetch_bytes_total", len(response.content))
+        if self.cache is not None:
+            self.cache.put(url, html)
+        return ConditionalResponse(
+            html, response.headers.get("ETag"), response.headers.get("Last-Modified")
+        )
+
+    def _record(self, url, status, start, attempts):
+        timing = RequestTiming(url, status, time.perf_counter() - start, attempts)
+        with self._lock:
+            self.timings.append(timing)
+        metrics = get_metrics()
+        metrics.observe("fetch_seconds", timing.elapsed)
+        metrics.inc("fetch_requests_total", status=status or "error")
+        if attempts > 1:
+            metrics.inc("fetch_retries_total", attempts - 1)
+        metrics.event("fetch", **timing._asdict())
+
+    def summary(self) -> dict:
+        """Resumen de las solicitudes hechas hasta ahora"""
+        with self._lock:
+            timings = list(self.timings)
+        hosts = self.controller.summary() if self.controller is not None else {}
+        if not timings:
+            return {"solicitudes": 0, "cache": self.cache_hits, "hosts": hosts}
+        elapsed = sorted(timing.elapsed for timing in timings)
+        return {
+            "solicitudes": len(timings),
+            "cache": self.cache_hits,
+            "reintentos": sum(timing.attempts - 1 for timing in timings),
+            "fallidas": sum(
+                1 for timing in timings if timing.status is None or timing.status >= 400
+            ),
+            "tiempo_total": sum(elapsed),
+            "tiempo_medio": sum(elapsed) / len(elapsed),
+            "tiempo_max": elapsed[-1],
+            "hosts": hosts,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    """Devuelve el Fetcher compartido por todo el proceso, creándolo si hace falta"""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+        return _default_fetcher
+
+
+def set_fetcher(fetcher: Fetcher):
+    """Reemplaza el Fetcher compartido (por ejemplo, por uno con caché o en replay)"""
+    global _default_fetcher
+    with _default_lock:
+        _default_fetcher = fetcher
@@ -1,7 +1,36 @@
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from mercadolibre import scrape_all_pages, get_categories
-from database import insert_data
-from visualizer import DataVisualizer
+from archive import ARCHIVE_DIR, ArchiveWriter
+from cache import CACHE_DIR, HtmlCache
+from dedup import ListingIndex
+from export import EXPORT_DIR, RunExporter, export_datadict
+from fetcher import Fetcher, get_fetcher, set_fetcher
+from metrics import Metrics, get_metrics, set_metrics
+from parsing import ParserPool, get_parser_pool, set_parser_pool
+from ratelimit import MAX_LIMIT
+from visualizer import REPORT_DIR
+from mercadolibre import (
+    fetch_pages,
+    get_categories,
+    iter_listings,
+    plan_shards,
+    scrape_all_pages,
+)
+from database import (
+    DB_URL,
+    completed_categories,
+    completed_pages,
+    finish_category,
+    finish_run,
+    insert_data,
+    insert_pages,
+    last_unfinished_run,
+    start_category,
+    start_run,
+)
 
 # URL base de Mercado Libre.
 URL_BASE = "https://listado.mercadolibre.com.ar/"
@@ -9,60 +38,592 @@ URL_BASE = "https://listado.mercadolibre.com.ar/"
 # Mercado Libre nos muestra 50 productos por página, así que lo guardamos como una constante
 PRODUCTS_PER_PAGE = 50
 
+# Solicitudes simultáneas permitidas para todo el crawl, sumando todas las categorías.
+# Es el mismo techo que el del límite adaptativo por host (ver `ratelimit`), que
+# arranca más abajo y es el que decide cuántas van en paralelo según cómo responde el
+# sitio.
+MAX_REQUESTS = MAX_LIMIT
+
+# Categorías que se scrapean a la vez. Cada una descarga con su propio pool de hasta
+# `max_requests` hilos, así que con pocas alcanza para llenar el presupuesto compartido
+MAX_CATEGORIES = 4
+
+# Categorías que se scrapean a la vez en modo lote (--batch), sumando todas las búsquedas
+BATCH_CATEGORIES = 8
+
+# Cómo queda registrada en `corridas` una corrida en modo lote
+BATCH_LABEL = "lote: {}"
+
+
+def search_url(search: str) -> str:
+    """URL de la búsqueda de `search` en Mercado Libre"""
+    search_query = search.replace(" ", "-")
+    return f"{URL_BASE}{search_query}#D[A:{search_query}]"
+
+
+def archiver(archive, categoria: str):
+    """Callback `on_page` que guarda cada página de `categoria` en `archive`"""
+    if archive is None:
+        return None
+    return lambda page, url, html: archive.add(url, html, categoria, page)
+
+
+def scrape_category(
+    name: str,
+    link: str,
+    limiter,
+    max_requests: int = MAX_REQUESTS,
+    print_products: bool = True,
+    seen=None,
+    archive=None,
+):
+    """Scrapea una categoría completa y devuelve su diccionario producto_precios.
+
+    Con un índice `seen` (ver `dedup.ListingIndex`) se saltean las publicaciones que
+    ya aparecieron en otra categoría de la corrida. Con un `archive` (ver
+    `archive.ArchiveWriter`) cada página descargada queda archivada.
+    """
+    return scrape_all_pages(
+        categories_search=link,
+        max_workers=max_requests,
+        limiter=limiter,
+        print_products=print_products,
+        seen=seen,
+        on_page=archiver(archive, name),
+    )
+
+
+def stream_category(
+    name: str,
+    link: str,
+    limiter,
+    corrida_id: int,
+    max_requests: int = MAX_REQUESTS,
+    exporter=None,
+    seen=None,
+    checkpoint: str = None,
+    archive=None,
+):
+    """Descarga, parsea y guarda una categoría página por página.
+
+    Las publicaciones van a la base en tandas a medida que se parsean, sin acumular la
+    categoría en memoria, y cada página guardada queda como checkpoint de la corrida:
+    si la corrida se retoma, esas páginas no se vuelven a pedir. Con un `exporter`
+    (ver `export.RunExporter`) las páginas también se exportan a Parquet. Con un
+    índice `seen` (ver `dedup.ListingIndex`) las publicaciones que ya aparecieron en
+    otra categoría de la corrida no se vuelven a guardar ni exportar. Devuelve
+    cuántas publicaciones se guardaron.
+
+    Las categorías con más resultados de los que muestra Mercado Libre se recorren por
+    rangos de precio (ver `mercadolibre.plan_shards`), con los checkpoints de cada
+    rango por separado. Los checkpoints van a nombre de `checkpoint` (por defecto, el
+    de la categoría), por si la misma categoría aparece en varias búsquedas. Con un
+    `archive` (ver `archive.ArchiveWriter`) cada página descargada queda archivada.
+    """
+    key = checkpoint or name
+    start_category(corrida_id, key, link)
+    failed = []
+
+    def downloaded(pages):
+        for page in pages:
+            if page[2] is None:
+                failed.append(page[0])
+            else:
+                if exporter is not None:
+                    exporter.add(name, page[2])
+                yield page
 
-def main(input_=""):
+    try:
+        total = 0
+        for shard in plan_shards(link, limiter=limiter):
+            if seen is None and shard.low is not None:
+                # Los rangos comparten los precios límite
+                seen = ListingIndex()
+            shard_key = (
+                key if shard.low is None else f"{key} [{shard.low}-{shard.high or ''}]"
+            )
+            pages = iter_listings(
+                shard.url,
+                max_workers=max_requests,
+                limiter=limiter,
+                skip_pages=completed_pages(corrida_id, shard_key),
+                seen=seen,
+                first_html=shard.html,
+                on_page=archiver(archive, name),
+            )
+            total += insert_pages(
+                name, downloaded(pages), corrida_id, checkpoint=shard_key
+            )
+    except requests.exceptions.RequestException as error:
+        print("Error de conexión", error)
+        return 0
+    # Si alguna página falló la categoría queda abierta para retomarla después
+    if not failed:
+        finish_category(corrida_id, key)
+    return total
+
+
+def close_archive(archive_writer):
+    """Cierra el archivo de HTML (escribe su índice) e informa cuánto ocupa"""
+    if archive_writer is not None:
+        archive_writer.close()
+        print(f"Archivo de HTML: {archive_writer.summary()}")
+
+
+def crawl_categories(
+    categories: dict,
+    max_requests: int = MAX_REQUESTS,
+    task=scrape_category,
+    max_categories: int = MAX_CATEGORIES,
+):
+    """Scrapea varias categorías en paralelo bajo un único presupuesto de solicitudes.
+
+    `categories` es el diccionario {nombre: {"cantidad": ..., "link": ...}} que devuelve
+    `get_categories`. Las categorías más grandes arrancan primero, así el tiempo total
+    se acerca al de la categoría más grande y no a la suma de todas.
+    Cada categoría se procesa con `task(nombre, link, limiter)` (por defecto
+    `scrape_category`). Solo se procesan `max_categories` categorías a la vez (por
+    defecto `MAX_CATEGORIES`; con None, todas). Devuelve {nombre: resultado} en el
+    mismo orden que `categories`, sin las categorías que no devolvieron nada.
+    """
+    pending = [(name, info) for name, info in categories.items() if info.get("link")]
+    if not pending:
+        return {}
+    pending.sort(key=lambda item: int(item[1].get("cantidad") or 0), reverse=True)
+
+    limiter = threading.BoundedSemaphore(max_requests)
+    workers = min(len(pending), max_categories or len(pending))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for name, info in pending:
+            print("**" * 10)
+            print(f"{name} CANTIDAD: {info.get('cantidad')}")
+            print("**" * 10)
+            futures[name] = executor.submit(task, name, info["link"], limiter)
+        results = {
+            name: futures[name].result() for name in categories if name in futures
+        }
+
+    # scrape_all_pages devuelve None si la categoría no tiene resultados
+    return {name: result for name, result in results.items() if result}
+
+
+def main(
+    input_="",
+    stream=False,
+    resume=False,
+    plots=True,
+    parquet=None,
+    quiet=False,
+    dedup=True,
+    archive=None,
+):
     if input_:
         search = input_
     else:
         search = input("Introduce el artículo a buscar: ")
 
-    search_query = search.replace(" ", "-")
-    url = f"{URL_BASE}{search_query}#D[A:{search_query}]"
+    url = search_url(search)
 
     try:
-        response = requests.get(url, timeout=300)
-        _html = response.text
-        
-    except:
-        print("Error de conexión")
+        _html = get_fetcher().get_text(url)
+    except requests.exceptions.RequestException as error:
+        print("Error de conexión", error)
+        return
 
     cat = get_categories(_html)
 
+    # Una publicación aparece en varias categorías: con `dedup` se guarda una sola vez
+    # por corrida, en la primera categoría que la encuentra
+    seen = ListingIndex() if dedup else None
 
     # print("Categorias devueltas!!"*3)
     if cat:
-        finalDict = {}
-        for categoryName, categoriePriceLink in cat.items():                   
-            for k, v in categoriePriceLink.items():
-                print("**"*10)
-                print(f"{k} CANTIDAD: {v.get("cantidad")}")
-                print("**"*10)
-                link = v.get("link")
-                if link:
-                    finalDict[k]=scrape_all_pages(categories_search=link)
-            print(finalDict)
-        # for categoria, prod in asd.items():
-        #     print(f"{categoria}:  {len(prod)}")
-
-        # Iniciamos el ciclo por categoría
-        for categoria, productos in finalDict.items():
-            # Reseteamos el contador de productos por cada categoría
-            total_productos = 0
-            print(f"\nCategoría: {categoria}")
-            
-            # Recorremos los productos dentro de la categoría
-            for nombre_producto, detalles in productos.items():
-                cantidad_precios = len(detalles['Precio'])  # Contamos la cantidad de precios
-                total_productos += cantidad_precios  # Sumamos al total de productos
-                
-            print(f"Total de productos en '{categoria}': {total_productos}")
-        
-    
-        insert_data(finalDict)
-        visualizer = DataVisualizer("sqlite:///mi_base_de_datos.db")
-        visualizer.plot_suma_precios()
-        visualizer.plot_distribucion_categorias()
+        if stream or resume:
+            # Cada categoría se guarda a medida que se scrapea. Al retomar se sigue la
+            # última corrida sin terminar y se saltean las categorías ya completas.
+            corrida_id = resume and last_unfinished_run(search)
+            if corrida_id:
+                print(f"Retomando la corrida {corrida_id}")
+                terminadas = completed_categories(corrida_id)
+            else:
+                corrida_id = start_run(search)
+                terminadas = set()
+            exporter = RunExporter(corrida_id, parquet) if parquet else None
+            archive_writer = ArchiveWriter(corrida_id, archive) if archive else None
+            try:
+                for categoryName, categoriePriceLink in cat.items():
+                    pendientes = {
+                        name: info
+                        for name, info in categoriePriceLink.items()
+                        if name not in terminadas
+                    }
+                    totales = crawl_categories(
+                        pendientes,
+                        task=lambda name, link, limiter: stream_category(
+                            name,
+                            link,
+                            limiter,
+                            corrida_id,
+                            exporter=exporter,
+                            seen=seen,
+                            archive=archive_writer,
+                        ),
+                    )
+                    for categoria, total_productos in totales.items():
+                        print(f"Total de productos en '{categoria}': {total_productos}")
+            finally:
+                if exporter is not None:
+                    exporter.close()
+                close_archive(archive_writer)
+            faltan = {
+                name
+                for links in cat.values()
+                for name, info in links.items()
+                if info.get("link")
+            } - completed_categories(corrida_id)
+            if faltan:
+                print(
+                    f"Categorías sin terminar: {sorted(faltan)}. Retomar con --resume"
+                )
+            else:
+                finish_run(corrida_id)
+            print(f"Solicitudes HTTP: {get_fetcher().summary()}")
+            if seen is not None:
+                print(f"Publicaciones: {seen.summary()}")
+        else:
+            # Para archivar las páginas hace falta el id de la corrida desde el principio
+            corrida_id = start_run(search) if archive else None
+            archive_writer = ArchiveWriter(corrida_id, archive) if archive else None
+            finalDict = {}
+            try:
+                for categoryName, categoriePriceLink in cat.items():
+                    finalDict.update(
+                        crawl_categories(
+                            categoriePriceLink,
+                            task=lambda name, link, limiter: scrape_category(
+                                name,
+                                link,
+                                limiter,
+                                print_products=not quiet,
+                                seen=seen,
+                                archive=archive_writer,
+                            ),
+                        )
+                    )
+                    if not quiet:
+                        print(finalDict)
+            finally:
+                close_archive(archive_writer)
+            # for categoria, prod in asd.items():
+            #     print(f"{categoria}:  {len(prod)}")
+
+            # Iniciamos el ciclo por categoría
+            for categoria, productos in finalDict.items():
+                # Reseteamos el contador de productos por cada categoría
+                total_productos = 0
+                print(f"\nCategoría: {categoria}")
+
+                # Recorremos los productos dentro de la categoría
+                for nombre_producto, detalles in productos.items():
+                    # Contamos la cantidad de precios y los sumamos al total
+                    total_productos += len(detalles["Precio"])
+
+                print(f"Total de productos en '{categoria}': {total_productos}")
+
+            print(f"Solicitudes HTTP: {get_fetcher().summary()}")
+            if seen is not None:
+                print(f"Publicaciones: {seen.summary()}")
+
+            if corrida_id is None:
+                corrida_id = start_run(search)
+            insert_data(finalDict, corrida_id=corrida_id)
+            if parquet:
+                export_datadict(finalDict, corrida_id, parquet)
+            finish_run(corrida_id)
+
+        if plots:
+            # pandas, matplotlib y seaborn solo se cargan si vamos a graficar
+            from visualizer import DataVisualizer
+
+            visualizer = DataVisualizer(DB_URL)
+            visualizer.plot_suma_precios()
+            visualizer.plot_distribucion_categorias()
+
+
+def read_queries(path: str):
+    """Búsquedas de un archivo de texto, una por línea (se ignoran las vacías y las
+    que empiezan con #), sin repetir"""
+    with open(path, encoding="utf-8") as file:
+        lines = (line.strip() for line in file)
+        return list(dict.fromkeys(line for line in lines if line and line[0] != "#"))
+
+
+def run_batch(
+    queries,
+    resume=False,
+    parquet=None,
+    dedup=True,
+    max_requests: int = MAX_REQUESTS,
+    max_categories: int = BATCH_CATEGORIES,
+    archive=None,
+):
+    """Scrapea muchas búsquedas en un solo proceso, como una única corrida.
+
+    Todas las búsquedas comparten el Fetcher (y su caché), el índice de publicaciones
+    vistas, la conexión a la base y un mismo presupuesto de `max_requests`
+    solicitudes. Primero se piden en paralelo las páginas de todas las búsquedas para
+    sacar sus categorías; después las categorías de todas las búsquedas se reparten
+    juntas (las más grandes primero, `max_categories` a la vez), así el trabajo se
+    intercala entre búsquedas en lugar de ir una por una. Siempre guarda en modo
+    streaming y no muestra gráficos. Con `resume` retoma la última corrida sin
+    terminar del mismo lote. Con `archive` (una carpeta) las páginas descargadas se
+    archivan ahí (ver `archive.ArchiveWriter`). Devuelve el id de la corrida.
+    """
+    queries = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+    label = BATCH_LABEL.format(" | ".join(queries))
+    corrida_id = resume and last_unfinished_run(label)
+    if corrida_id:
+        print(f"Retomando la corrida {corrida_id}")
+    else:
+        corrida_id = start_run(label)
+    terminadas = completed_categories(corrida_id)
+
+    # La clave de cada tarea es "búsqueda / categoría": la misma categoría puede
+    # aparecer en varias búsquedas con links distintos
+    tareas = {}
+    fallidas = []
+    pages = fetch_pages([search_url(query) for query in queries], max_requests)
+    for query, html in zip(queries, pages):
+        if html is None:
+            print(f"No se pudo descargar la búsqueda '{query}'")
+            fallidas.append(query)
+            continue
+        categorias = get_categories(html)
+        if not categorias:
+            print(f"La búsqueda '{query}' no tiene resultados ni categorías")
+            continue
+        for links in categorias.values():
+            for name, info in links.items():
+                if info.get("link"):
+                    tareas[f"{query} / {name}"] = {**info, "categoria": name}
+    print(f"{len(queries)} búsquedas, {len(tareas)} categorías")
+
+    seen = ListingIndex() if dedup else None
+    exporter = RunExporter(corrida_id, parquet) if parquet else None
+    archive_writer = ArchiveWriter(corrida_id, archive) if archive else None
+    try:
+        totales = crawl_categories(
+            {key: info for key, info in tareas.items() if key not in terminadas},
+            max_requests,
+            task=lambda key, link, limiter: stream_category(
+                tareas[key]["categoria"],
+                link,
+                limiter,
+                corrida_id,
+                max_requests,
+                exporter=exporter,
+                seen=seen,
+                checkpoint=key,
+                archive=archive_writer,
+            ),
+            max_categories=max_categories,
+        )
+    finally:
+        if exporter is not None:
+            exporter.close()
+        close_archive(archive_writer)
+    print(f"Publicaciones guardadas: {sum(totales.values())}")
+
+    faltan = set(tareas) - completed_categories(corrida_id)
+    if faltan or fallidas:
+        print(
+            f"Búsquedas sin descargar: {fallidas}. Categorías sin terminar: "
+            f"{sorted(faltan)}. Retomar con --resume"
+        )
+    else:
+        finish_run(corrida_id)
+    print(f"Solicitudes HTTP: {get_fetcher().summary()}")
+    if seen is not None:
+        print(f"Publicaciones: {seen.summary()}")
+    return corrida_id
+
+
+def add_common_arguments(parser):
+    """Agrega las opciones que comparten main.py, scrape.py y watch.py"""
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=CACHE_DIR,
+        default=None,
+        help=f"Guarda y reutiliza el HTML descargado (por defecto en {CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="No sale a la red: sirve todas las páginas desde la caché",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        dest="dedup",
+        action="store_false",
+        help="Guarda cada publicación en todas las categorías donde aparece",
+    )
+    parser.add_argument(
+        "--log-json",
+        default=None,
+        help="Agrega un log estructurado (una línea JSON por evento) a este archivo",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Al terminar escribe las métricas en este archivo, en formato Prometheus",
+    )
+    return parser
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Scraper de Mercado Libre")
+    parser.add_argument("busqueda", nargs="?", default="", help="Artículo a buscar")
+    add_common_arguments(parser)
+    parser.add_argument(
+        "--batch",
+        default=None,
+        metavar="ARCHIVO",
+        help="Scrapea todas las búsquedas del archivo (una por línea) en una corrida",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Guarda cada categoría en la base a medida que se scrapea",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Retoma la última corrida sin terminar de la búsqueda (implica --stream)",
+    )
+    parser.add_argument(
+        "--parquet",
+        nargs="?",
+        const=EXPORT_DIR,
+        default=None,
+        help=f"Exporta la corrida a Parquet (por defecto en {EXPORT_DIR})",
+    )
+    parser.add_argument(
+        "--archive",
+        nargs="?",
+        const=ARCHIVE_DIR,
+        default=None,
+        help=f"Archiva el HTML de cada página descargada (por defecto en {ARCHIVE_DIR})",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="No imprime cada producto encontrado",
+    )
+    parser.add_argument(
+        "--parsers",
+        nargs="?",
+        type=int,
+        const=0,
+        default=None,
+        help="Parsea las páginas en N procesos aparte (sin N, uno por núcleo)",
+    )
+    parser.add_argument(
+        "--report",
+        nargs="?",
+        const=REPORT_DIR,
+        default=None,
+        help=f"Al terminar guarda los gráficos en PNG y SVG (por defecto en {REPORT_DIR})",
+    )
+    parser.add_argument(
+        "--no-plots",
+        dest="plots",
+        action="store_false",
+        help="No muestra los gráficos al terminar",
+    )
+    return parser.parse_args(args)
+
+
+def write_report(directory: str):
+    """Guarda los gráficos en `directory` sin display (ver `DataVisualizer.render_report`)"""
+    # pandas, matplotlib y seaborn solo se cargan si vamos a graficar
+    from visualizer import DataVisualizer
+
+    DataVisualizer(DB_URL).render_report(directory)
+
+
+def configure_fetcher(args):
+    """Configura el Fetcher compartido según las opciones --cache / --replay"""
+    if args.cache or args.replay:
+        set_fetcher(
+            Fetcher(cache=HtmlCache(args.cache or CACHE_DIR), replay=args.replay)
+        )
+
+
+def configure_metrics(args):
+    """Configura las métricas compartidas según la opción --log-json"""
+    if args.log_json:
+        set_metrics(Metrics(log_path=args.log_json))
+
+
+def configure_parsers(args):
+    """Configura el pool de procesos parseadores según la opción --parsers"""
+    if args.parsers is not None:
+        set_parser_pool(ParserPool(args.parsers or None))
+
+
+def close_parsers():
+    """Cierra los procesos parseadores, si hay un pool configurado"""
+    pool = get_parser_pool()
+    if pool is not None:
+        pool.close()
+
+
+def report_metrics(args):
+    """Imprime el resumen de métricas, lo registra en el log y escribe --metrics"""
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+    print(f"Métricas: {snapshot}")
+    metrics.event("resumen", **snapshot)
+    if args.metrics:
+        metrics.write_prometheus(args.metrics)
+    metrics.close()
+
+
+def run(args):
+    """Corre el scraper con las opciones de `parse_args`: configura el Fetcher, las
+    métricas y los parseadores, scrapea la búsqueda (o el lote) y al final guarda el
+    reporte y las métricas"""
+    configure_fetcher(args)
+    configure_metrics(args)
+    configure_parsers(args)
+    try:
+        if args.batch:
+            run_batch(
+                read_queries(args.batch),
+                resume=args.resume,
+                parquet=args.parquet,
+                dedup=args.dedup,
+                archive=args.archive,
+            )
+        else:
+            main(
+                args.busqueda,
+                stream=args.stream,
+                resume=args.resume,
+                plots=args.plots,
+                parquet=args.parquet,
+                quiet=args.quiet,
+                dedup=args.dedup,
+                archive=args.archive,
+            )
+        if args.report:
+            write_report(args.report)
+    finally:
+        close_parsers()
+        report_metrics(args)
 
 
 if __name__ == "__main__":
-    main()
+    run(parse_args())
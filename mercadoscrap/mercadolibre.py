@@ -1,19 +1,16 @@
 import math  # 🧮 Matemáticas para calcular cuántas páginas hay en total
-import os
 import re  # 🧙‍♂️ Expresiones regulares, la varita mágica para buscar patrones en el HTML
-import requests  # 🕸️ Solicitudes HTTP
-from bs4 import BeautifulSoup
-
-######################################################################
-# Remuevo la base de datos anterior si es que existe######################################################################
-db_path = "mi_base_de_datos.db"
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor  # 🧵 Descargas en paralelo
 
-if os.path.exists(db_path):
-    os.remove(db_path)
-    print(f"Base de datos '{db_path}' eliminada exitosamente.")
-else:
-    print(f"El archivo '{db_path}' no existe.")
-######################################################################
+import requests  # 🕸️ Solicitudes HTTP
+from bs4 import BeautifulSoup, SoupStrainer
+from dedup import ListingIndex
+from fetcher import get_fetcher
+from metrics import get_metrics
+from parsing import get_parser_pool
+from prices import format_price, parse_prices
 
 # URL base de Mercado Libre.
 URL_BASE = "https://listado.mercadolibre.com.ar/"
@@ -21,6 +18,82 @@ URL_BASE = "https://listado.mercadolibre.com.ar/"
 # Mercado Libre nos muestra 50 productos por página, así que lo guardamos como una constante
 PRODUCTS_PER_PAGE = 50
 
+# Cantidad máxima de solicitudes en vuelo al descargar las páginas de una categoría
+MAX_WORKERS = 8
+
+# Mercado Libre no sirve resultados más allá de este desplazamiento (40 páginas). Las
+# búsquedas más grandes se parten en rangos de precio (ver `plan_shards`).
+LISTING_CAP = 2000
+
+# Al partir una búsqueda, cada rango apunta a esta fracción del tope, así el error de
+# estimar con una sola página de precios no lo deja otra vez por encima
+SHARD_FILL = 0.7
+
+# Máximo de rangos por búsqueda, por si los precios no alcanzan a separar los resultados
+MAX_SHARDS = 200
+
+# Filtro de rango de precio de la URL, en pesos. Un máximo de 0 significa "sin tope".
+PRICE_RANGE = "_PriceRange_{low}-{high}"
+
+# Si scrape_all_pages imprime cada producto encontrado (`main.py --quiet` lo apaga)
+PRINT_PRODUCTS = True
+
+# Un producto de la grilla: título, precio actual en centavos (sin el del buy box) e id
+# de la publicación
+Listing = namedtuple("Listing", ["title", "price", "item_id"])
+
+# Marcas del HTML de la grilla de resultados. Se buscan con `str.find`, que es mucho
+# más rápido que un regex con alternativas sobre páginas de varios cientos de KB.
+CARD_PATTERN = re.compile(r'<div class="poly-card[ "]')
+TITLE_TAG = '<h2 class="poly-box poly-component__title"><a'
+TITLE_END = "</a></h2>"
+BUY_BOX_TAG = '<div class="poly-component__buy-box">'
+PRICE_TAG = '<div class="poly-price__current">'
+FRACTION_TAG = '<span class="andes-money-amount__fraction" aria-hidden="true">'
+CENTS_TAG = '</span><span class="andes-money-amount__cents'
+
+# Texto válido de una fracción ("1.234") y de los centavos ("50"). Una tarjeta cuya
+# fracción no lo cumple ("Consultar", "1,234") queda sin precio.
+FRACTION_PATTERN = re.compile(r"[0-9][0-9.]*")
+CENTS_PATTERN = re.compile(r"[0-9]{1,2}")
+
+# Backend de BeautifulSoup para get_categories ("html.parser", "lxml", ...)
+CATEGORIES_PARSER = "html.parser"
+
+# Cómo arma get_categories el árbol:
+#   "regions":  recorta solo los bloques de filtros, el breadcrumb y la cantidad de
+#               resultados y parsea esos fragmentos (lo más rápido)
+#   "strainer": parsea toda la página pero solo construye esos elementos
+#   "full":     parsea la página completa, por si cambia el markup
+CATEGORIES_STRATEGY = "regions"
+
+# Regiones que necesita get_categories: (inicio, etiqueta que la cierra, cierre extra)
+CATEGORY_REGIONS = [
+    (re.compile(r'<div class="ui-search-filter-dl[ "]'), "</ul>", "</div>"),
+    (re.compile(r'<ol class="andes-breadcrumb[ "]'), "</ol>", ""),
+    (re.compile(r'<h1 class="ui-search-breadcrumb__title[ "]'), "</h1>", ""),
+    (
+        re.compile(r'<span class="ui-search-search-result__quantity-results[ "]'),
+        "</span>",
+        "",
+    ),
+]
+CATEGORIES_STRAINER = SoupStrainer(
+    class_=[
+        "ui-search-filter-dl",
+        "andes-breadcrumb",
+        "ui-search-breadcrumb__title",
+        "ui-search-search-result__quantity-results",
+    ]
+)
+
+# Un rango de precio de una búsqueda: URL con el filtro, cantidad de resultados, límites
+# en pesos (None si la búsqueda no se partió) y el HTML de su primera página
+Shard = namedtuple("Shard", ["url", "total", "low", "high", "html"])
+
+# Id de la publicación dentro del link de la tarjeta (MLA-123456 o MLA123456)
+ITEM_ID_PATTERN = re.compile(r"MLA-?(\d+)")
+
 
 def get_total_results(html: str):
     """Saca el número total de resultados de la búsqueda usando expresiones regulares"""
@@ -37,31 +110,123 @@ def get_total_results(html: str):
     return 0
 
 
-def extract_products_and_prices(html: str):
-    """Extrae los nombres de los productos y sus precios"""
-    product_pattern = re.compile(
-        r'<h2 class="poly-box poly-component__title"><a[^>]*>(.*?)</a></h2>', re.DOTALL
-    )
-    price_pattern = re.compile(
-        r'<div class="poly-price__current">.*?<span class="andes-money-amount__fraction" aria-hidden="true">([\d.,]+)</span>',
-        re.DOTALL,
-    )
-    buy_box_pattern = re.compile(
-        r'<div class="poly-component__buy-box">.*?<div class="poly-price__current">.*?<span class="andes-money-amount__fraction" aria-hidden="true">([\d.,]+)</span>',
-        re.DOTALL,
-    )
-
-    products = product_pattern.findall(html)
-    buy_box_prices = buy_box_pattern.findall(html)
-    all_prices = price_pattern.findall(html)
-    filtered_prices = [price for price in all_prices if price not in buy_box_prices]
-
-    return products, filtered_prices
+def extract_listings(html: str):
+    """Recorre cada tarjeta `poly-card` una sola vez y devuelve un `Listing` por tarjeta.
+
+    El precio es el primero de `poly-price__current` de la tarjeta, ignorando el que
+    aparece dentro del buy box, en centavos enteros (fracción más centavos). Si la
+    tarjeta no tiene precio, o su fracción no es un número (`FRACTION_PATTERN`), queda
+    en None, así los títulos y los precios nunca se desalinean.
+    """
+    starts = [match.start() for match in CARD_PATTERN.finditer(html)]
+    if not starts:
+        # Markup sin tarjetas: cada título marca el comienzo de un producto
+        starts = [match.start() for match in re.finditer(re.escape(TITLE_TAG), html)]
+
+    rows = []
+    fractions = []
+    cents = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else len(html)
+
+        title_at = html.find(TITLE_TAG, start, end)
+        if title_at == -1:
+            continue
+        attrs_at = title_at + len(TITLE_TAG)
+        text_at = html.find(">", attrs_at, end) + 1
+        text_end = html.find(TITLE_END, text_at, end)
+        if not text_at or text_end == -1:
+            continue
+        title = html[text_at:text_end]
+        item_id = ITEM_ID_PATTERN.search(html, attrs_at, text_at)
+        item_id = f"MLA{item_id.group(1)}" if item_id else None
+
+        # El primer precio después del título, salvo que ya estemos dentro del buy box
+        fraction = None
+        price_at = html.find(PRICE_TAG, text_end, end)
+        if price_at != -1 and html.find(BUY_BOX_TAG, text_end, price_at) == -1:
+            fraction_at = html.find(FRACTION_TAG, price_at, end)
+            if fraction_at != -1:
+                fraction_at += len(FRACTION_TAG)
+                fraction_end = html.find("<", fraction_at, end)
+                fraction = html[fraction_at:fraction_end]
+                if not FRACTION_PATTERN.fullmatch(fraction):
+                    fraction = None
+                cent = None
+                # Los centavos, si los hay, van en un span pegado a la fracción
+                if html.startswith(CENTS_TAG, fraction_end):
+                    cents_at = html.find(">", fraction_end + len(CENTS_TAG), end) + 1
+                    cent = html[cents_at : html.find("<", cents_at, end)]
+                    if not CENTS_PATTERN.fullmatch(cent):
+                        cent = None
+                if fraction:
+                    fractions.append(fraction)
+                    cents.append(cent)
+
+        rows.append((title, bool(fraction), item_id))
+
+    # Todos los precios de la página se convierten a centavos de una vez
+    prices = iter(parse_prices(fractions, cents))
+    return [
+        Listing(title, next(prices) if has_price else None, item_id)
+        for title, has_price, item_id in rows
+    ]
 
 
-def get_categories(html: str):
-    """Extrae las categorías y sus cantidades de resultados"""
-    soup = BeautifulSoup(html, "html.parser")
+def extract_products_and_prices(html: str):
+    """Extrae los nombres de los productos y sus precios.
+
+    Devuelve dos listas alineadas, con los precios en centavos; las tarjetas sin
+    precio se descartan.
+    """
+    listings = [
+        listing for listing in extract_listings(html) if listing.price is not None
+    ]
+    products = [listing.title for listing in listings]
+    prices = [listing.price for listing in listings]
+    return products, prices
+
+
+def extract_category_regions(html: str):
+    """Recorta del HTML solo los fragmentos que usa get_categories, en orden"""
+    fragments = []
+    for pattern, end_tag, closing in CATEGORY_REGIONS:
+        starts = [match.start() for match in pattern.finditer(html)]
+        for index, start in enumerate(starts):
+            # Una región nunca se mete en la siguiente del mismo tipo
+            limit = starts[index + 1] if index + 1 < len(starts) else len(html)
+            end = html.find(end_tag, start, limit)
+            end = end + len(end_tag) if end != -1 else limit
+            fragments.append(html[start:end] + closing)
+    return "".join(fragments)
+
+
+def parse_categories_html(
+    html: str, parser: str = CATEGORIES_PARSER, strategy: str = CATEGORIES_STRATEGY
+):
+    """Arma el árbol de BeautifulSoup que usa get_categories según `strategy`"""
+    if strategy == "regions":
+        fragments = extract_category_regions(html)
+        if fragments:
+            return BeautifulSoup(fragments, parser)
+        # Si no encontramos ninguna región probamos con el árbol filtrado
+        strategy = "strainer"
+    if strategy == "strainer":
+        return BeautifulSoup(html, parser, parse_only=CATEGORIES_STRAINER)
+    if strategy == "full":
+        return BeautifulSoup(html, parser)
+    raise ValueError(f"Estrategia de parseo desconocida: {strategy}")
+
+
+def get_categories(
+    html: str, parser: str = CATEGORIES_PARSER, strategy: str = CATEGORIES_STRATEGY
+):
+    """Extrae las categorías y sus cantidades de resultados.
+
+    `parser` y `strategy` permiten elegir el backend (ver `CATEGORIES_STRATEGY`); con
+    `strategy="full"` se parsea la página completa como antes.
+    """
+    soup = parse_categories_html(html, parser=parser, strategy=strategy)
 
     # Buscar el <h3> que le da el nombre a la categoria"
     h3_elements = soup.find_all(
@@ -113,10 +278,14 @@ def get_categories(html: str):
             "span", class_="ui-search-search-result__quantity-results"
         )
         link = soup.find("h1", class_="ui-search-breadcrumb__title")
+        # Sin breadcrumb o sin cantidad de resultados (una búsqueda sin resultados o un
+        # markup distinto) no hay de dónde sacar la categoría
+        if not spans or resultados is None:
+            print("No se encontraron <span> dentro del breadcrumb.")
+            return categories
         # Obtener el texto del último <span>
-        if spans:
-            ultimo_span_texto = spans[-1].get_text(strip=True)
-            print(f"Texto del último <span>: {ultimo_span_texto}")
+        ultimo_span_texto = spans[-1].get_text(strip=True)
+        print(f"Texto del último <span>: {ultimo_span_texto}")
         textoResultados = resultados.get_text(strip=True)
 
         # Extraer solo los números usando una expresión regular
@@ -134,11 +303,342 @@ def get_categories(html: str):
             }
             return categories
         else:
-            print("No se encontraron <span> dentro del breadcrumb.")
+            print("No se encontró el título del breadcrumb.")
+            return categories
 
 
-def scrape_all_pages(categories_search: str = ""):
-    """Recorre todas las páginas de resultados, buscando productos, precios y categorías"""
+def get_page_urls(url: str, total_results: int):
+    """Calcula las URLs de todas las páginas de resultados, en orden.
+
+    Nunca pasa de `LISTING_CAP` resultados: más allá Mercado Libre devuelve páginas
+    vacías.
+    """
+    total_pages = math.ceil(min(total_results, LISTING_CAP) / PRODUCTS_PER_PAGE)
+    page_urls = [url]
+    cleaned_url = url.split("NoIndex_True")[0]
+    for page in range(2, total_pages + 1):
+        offset = (page - 1) * PRODUCTS_PER_PAGE + 1
+        page_urls.append(f"{cleaned_url}Desde_{offset}_NoIndex_True")
+    return page_urls
+
+
+def fetch_page(page_url: str, limiter=None, fetcher=None):
+    """Descarga una página y devuelve su HTML.
+
+    Usa el `Fetcher` compartido (conexiones keep-alive y reintentos) salvo que se pase
+    otro. Si se pasa un `limiter` (por ejemplo un `threading.Semaphore` compartido) cada
+    intento de descarga se hace dentro de él, así varias categorías comparten un mismo
+    presupuesto; las esperas entre reintentos no ocupan lugar.
+    """
+    fetcher = fetcher or get_fetcher()
+    return fetcher.get_text(page_url, limiter=limiter)
+
+
+def fetch_pages(
+    page_urls,
+    max_workers: int = MAX_WORKERS,
+    limiter=None,
+    fetcher=None,
+    fetch=None,
+):
+    """Descarga las páginas con hasta `max_workers` solicitudes simultáneas.
+
+    Devuelve un iterador con el HTML de cada página en el mismo orden que `page_urls`.
+    Si una página falla después de todos los reintentos se devuelve None en su lugar,
+    así no se pierden las páginas que sí se descargaron. Con `fetch` cada página se
+    pide con `fetch(URL)` en lugar de `fetch_page` (por ejemplo, con un GET
+    condicional); lo que devuelva es lo que viene en el iterador.
+    """
+
+    def fetch_or_none(page_url):
+        try:
+            if fetch is not None:
+                return fetch(page_url)
+            return fetch_page(page_url, limiter=limiter, fetcher=fetcher)
+        except requests.exceptions.RequestException as error:
+            print(f"Error al descargar {page_url}: {error}")
+            return None
+
+    if max_workers <= 1:
+        yield from map(fetch_or_none, page_urls)
+        return
+    # Solo se adelantan `2 * max_workers` páginas, así las que todavía no se procesaron
+    # no se acumulan en memoria
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for page_url in page_urls:
+            pending.append(executor.submit(fetch_or_none, page_url))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_pages(
+    url: str,
+    max_workers: int = MAX_WORKERS,
+    limiter=None,
+    fetcher=None,
+    skip_pages=(),
+    first_html=None,
+    on_page=None,
+    fetch=None,
+):
+    """Genera (número de página, URL, HTML) de todas las páginas de resultados, en orden.
+
+    La primera página se descarga para saber cuántas hay (salvo que ya venga en
+    `first_html`); el resto se va descargando en paralelo a medida que se consumen.
+    Las páginas que fallaron vienen con HTML None. Las páginas en `skip_pages` (por
+    ejemplo, ya guardadas antes de un corte) no se descargan ni se devuelven. Si se
+    pasa `on_page`, se llama `on_page(número, URL, HTML)` con cada página descargada
+    (por ejemplo para archivarla, ver `archive.ArchiveWriter`). `fetch` se pasa a
+    `fetch_pages` para todas las páginas menos la primera.
+    """
+    if first_html is None:
+        first_html = fetch_page(url, limiter=limiter, fetcher=fetcher)
+
+    # Obtener el número total de resultados
+    total_results = get_total_results(first_html)
+    if total_results == 0:
+        print("No se encontraron resultados.")
+        return
+
+    print(f"Total de resultados: {total_results}")
+
+    # Calcular las páginas que debemos recorrer. La primera ya la tenemos.
+    page_urls = list(enumerate(get_page_urls(url, total_results), start=1))
+    if skip_pages:
+        print(f"Retomando: {len(skip_pages)} páginas ya guardadas")
+    if 1 not in skip_pages:
+        if on_page is not None:
+            on_page(1, url, first_html)
+        yield 1, url, first_html
+    pending = [
+        (page, page_url) for page, page_url in page_urls[1:] if page not in skip_pages
+    ]
+    pages = fetch_pages(
+        [page_url for _, page_url in pending],
+        max_workers=max_workers,
+        limiter=limiter,
+        fetcher=fetcher,
+        fetch=fetch,
+    )
+    for (page, page_url), html in zip(pending, pages):
+        if on_page is not None and html is not None:
+            on_page(page, page_url, html)
+        yield page, page_url, html
+
+
+def price_range_url(url: str, low: int, high: int = None) -> str:
+    """La URL de la búsqueda `url` filtrada a precios entre `low` y `high` pesos"""
+    base = url.split("#")[0].split("NoIndex_True")[0].rstrip("_")
+    return f"{base}{PRICE_RANGE.format(low=low, high=high or 0)}_NoIndex_True"
+
+
+def split_points(prices, parts: int, low: int, high: int = None):
+    """Cortes en pesos que reparten `prices` (en centavos) en hasta `parts` rangos con
+    más o menos la misma cantidad, todos estrictamente dentro de (`low`, `high`)"""
+    pesos = sorted(
+        price // 100
+        for price in prices
+        if price is not None
+        and low < price // 100
+        and (high is None or price // 100 < high)
+    )
+    cuts = []
+    for k in range(1, parts):
+        if not pesos:
+            break
+        cut = pesos[k * len(pesos) // parts]
+        if cut > (cuts[-1] if cuts else low):
+            cuts.append(cut)
+    if not cuts and high is not None and high - low > 1:
+        # Sin muestra útil: partimos el rango a la mitad (en escala logarítmica)
+        cuts.append(round(math.sqrt(max(low, 1) * high)) if low else high // 2)
+    return cuts
+
+
+def plan_shards(
+    url: str,
+    first_html: str = None,
+    cap: int = LISTING_CAP,
+    limiter=None,
+    fetcher=None,
+):
+    """Parte la búsqueda `url` en rangos de precio que entren bajo el tope de resultados.
+
+    Si la búsqueda tiene hasta `cap` resultados genera un único `Shard` sin filtro.
+    Si no, usa los precios de la primera página como muestra para cortar el rango en
+    tantas partes como hagan falta (ver `SHARD_FILL`), pide la primera página de cada
+    parte en paralelo y vuelve a partir las que siguen por encima del tope. Esa primera
+    página queda en el `Shard`, así `iter_pages` no la vuelve a pedir y la única
+    solicitud extra por rango es la de los que hubo que volver a partir.
+
+    Es un generador: cada rango sale apenas se sabe que entra bajo el tope, así se
+    puede recorrer antes de planificar el resto y no se acumula el HTML de todos los
+    rangos. De los que todavía hay que partir solo se guardan sus precios. Los rangos
+    salen en el orden en que se descubren, no por precio. Los rangos vacíos se
+    descartan; si un rango ya no se puede partir (todos los resultados al mismo
+    precio) sale como está, sin su primera página, y solo se cubren sus primeros
+    `cap` resultados.
+    """
+    if first_html is None:
+        first_html = fetch_page(url, limiter=limiter, fetcher=fetcher)
+    total = get_total_results(first_html)
+    if total <= cap:
+        yield Shard(url, total, None, None, first_html)
+        return
+
+    planned = covered = 0
+    prices = [listing.price for listing in extract_listings(first_html)]
+    del first_html
+    pending = deque([(0, None, prices, total)])
+    while pending:
+        low, high, prices, total = pending.popleft()
+        parts = math.ceil(total / (cap * SHARD_FILL))
+        cuts = split_points(prices, parts, low, high)
+        if not cuts or planned + len(pending) + len(cuts) >= MAX_SHARDS:
+            print(
+                f"No se puede partir el rango {low}-{high or ''}: "
+                f"se cubren {cap} de {total} resultados"
+            )
+            planned += 1
+            covered += cap
+            yield Shard(price_range_url(url, low, high), total, low, high, None)
+            continue
+
+        bounds = [low, *cuts, high]
+        ranges = list(zip(bounds, bounds[1:]))
+        range_urls = [price_range_url(url, a, b) for a, b in ranges]
+        pages = fetch_pages(range_urls, limiter=limiter, fetcher=fetcher)
+        for (a, b), range_url, page in zip(ranges, range_urls, pages):
+            if page is None:
+                # No se pudo pedir la primera página: iter_pages lo vuelve a intentar
+                planned += 1
+                yield Shard(range_url, None, a, b, None)
+                continue
+            range_total = get_total_results(page)
+            if range_total > cap:
+                range_prices = [listing.price for listing in extract_listings(page)]
+                pending.append((a, b, range_prices, range_total))
+            elif range_total:
+                planned += 1
+                covered += range_total
+                yield Shard(range_url, range_total, a, b, page)
+            del page
+
+    print(f"Búsqueda partida en {planned} rangos de precio ({covered} resultados)")
+
+
+def parse_page(page):
+    """Parsea una página (número, URL, HTML) de `iter_pages`. El HTML puede venir como
+    bytes en UTF-8, que es mucho más barato de mandar a otro proceso que un str.
+
+    Devuelve (número, URL, [Listing] con precio, bytes de HTML, segundos de parseo),
+    con None en lugar de la lista si la página no se pudo descargar. Los bytes son los
+    del HTML en UTF-8 (no los caracteres, que con acentos y eñes son menos) y se
+    cuentan fuera del tiempo de parseo. Está a nivel de módulo para que se pueda mandar
+    a un `parsing.ParserPool`.
+    """
+    number, page_url, html = page
+    if html is None:
+        return number, page_url, None, 0, 0.0
+    if isinstance(html, bytes):
+        size = len(html)
+        start = time.perf_counter()
+        html = html.decode("utf-8")
+    else:
+        size = len(html) if html.isascii() else len(html.encode("utf-8"))
+        start = time.perf_counter()
+    listings = [
+        listing for listing in extract_listings(html) if listing.price is not None
+    ]
+    return number, page_url, listings, size, time.perf_counter() - start
+
+
+def iter_listings(
+    url: str,
+    max_workers: int = MAX_WORKERS,
+    limiter=None,
+    fetcher=None,
+    skip_pages=(),
+    parser_pool=None,
+    seen=None,
+    first_html=None,
+    on_page=None,
+):
+    """Genera (número de página, URL, [Listing]) parseando cada página apenas llega.
+
+    Solo se incluyen las publicaciones con precio. Si una página no se pudo descargar
+    se devuelve con None en lugar de la lista. Con un índice `seen` (ver
+    `dedup.ListingIndex`) se descartan las publicaciones que ya aparecieron antes en
+    la corrida, en esta u otra categoría. Con un `parser_pool` (por defecto el de
+    `parsing.get_parser_pool`, si hay uno configurado) el parseo se hace en otros
+    procesos mientras se siguen descargando páginas; el orden no cambia.
+    """
+    pages = iter_pages(
+        url,
+        max_workers=max_workers,
+        limiter=limiter,
+        fetcher=fetcher,
+        skip_pages=skip_pages,
+        first_html=first_html,
+        on_page=on_page,
+    )
+    pool = parser_pool or get_parser_pool()
+    if pool is None:
+        parsed = map(parse_page, pages)
+    else:
+        parsed = pool.map(
+            parse_page,
+            (
+                (page, page_url, html.encode("utf-8") if html is not None else None)
+                for page, page_url, html in pages
+            ),
+        )
+    metrics = get_metrics()
+    for page, page_url, listings, size, elapsed in parsed:
+        if listings is None:
+            print(f"Salteando página {page}: {page_url}")
+            yield page, page_url, None
+            continue
+        print(f"Scraping página {page}: {page_url}")
+        metrics.observe("parse_seconds", elapsed)
+        metrics.inc("records_total", len(listings))
+        found = len(listings)
+        if seen is not None:
+            listings = seen.filter(listings)
+            metrics.inc("duplicates_total", found - len(listings))
+        metrics.event(
+            "pagina",
+            pagina=page,
+            url=page_url,
+            bytes=size,
+            segundos_parseo=round(elapsed, 6),
+            publicaciones=found,
+            repetidas=found - len(listings),
+        )
+        yield page, page_url, listings
+
+
+def scrape_all_pages(
+    categories_search: str = "",
+    max_workers: int = MAX_WORKERS,
+    limiter=None,
+    fetcher=None,
+    print_products: bool = PRINT_PRODUCTS,
+    seen=None,
+    on_page=None,
+):
+    """Recorre todas las páginas de resultados, buscando productos, precios y categorías.
+
+    Devuelve {producto: {"Precio": [centavos, ...], "Id": [...]}}, o None si no hay
+    resultados. Con `print_products=False` no imprime cada producto encontrado. Con un
+    índice `seen` (ver `dedup.ListingIndex`) se saltean las publicaciones ya vistas en
+    otras categorías de la corrida. Las búsquedas con más de `LISTING_CAP` resultados
+    se recorren por rangos de precio (ver `plan_shards`). `on_page` se pasa a
+    `iter_pages`.
+    """
     # if query_search:
     #     search_query = query_search.replace(" ", "-")
     #     url = f"{URL_BASE}{search_query}#D[A:{search_query}]"
@@ -146,60 +646,62 @@ def scrape_all_pages(categories_search: str = ""):
     # else:
     url = categories_search
     try:
-        response = requests.get(url, timeout=300)
-        _html = response.text
-
-        # Obtener el número total de resultados
-        total_results = get_total_results(_html)
-        if total_results == 0:
-            print("No se encontraron resultados.")
-            return
-
-        print(f"Total de resultados: {total_results}")
-
-        # Calcular cuántas páginas debemos recorrer
-        total_pages = math.ceil(total_results / PRODUCTS_PER_PAGE)
         all_products = []
         all_prices = []
-        cleaned_url = ""
-        for page in range(1, total_pages + 1):
-            if page == 1:
-                page_url = url
-            else:
-                if not cleaned_url:
-                    cleaned_url = url.split("NoIndex_True")[0]
-                offset = (page - 1) * PRODUCTS_PER_PAGE + 1
-                page_url = f"{cleaned_url}Desde_{offset}_NoIndex_True"
-
-            print(f"Scraping página {page}: {page_url}")
-
-            response = requests.get(page_url, timeout=300)
-            html = response.text
-
-            # Extraer productos y precios
-            products, prices = extract_products_and_prices(html)
+        all_ids = []
+        shards = plan_shards(url, limiter=limiter, fetcher=fetcher)
+
+        def shard_pages(seen):
+            for shard in shards:
+                if seen is None and shard.low is not None:
+                    # Los rangos comparten los precios límite: sin esto esas
+                    # publicaciones se contarían dos veces
+                    seen = ListingIndex()
+                yield from iter_listings(
+                    shard.url,
+                    max_workers=max_workers,
+                    limiter=limiter,
+                    fetcher=fetcher,
+                    seen=seen,
+                    first_html=shard.html,
+                    on_page=on_page,
+                )
+
+        pages = shard_pages(seen)
+        for _, _, listings in pages:
+            if listings is None:
+                continue
+            # Extraer productos, precios e ids de las publicaciones
+            products = [listing.title for listing in listings]
+            prices = [listing.price for listing in listings]
             all_products.extend(products)
             all_prices.extend(prices)
+            all_ids.extend(listing.item_id for listing in listings)
 
             print(len(products), "PRODUCTOS ENCONTRADOS \n")
             print(len(set(products)), "PRODUCTOS ÚNICOS")
 
-            for product, price in zip(products, prices):
-                formatted_price = price.replace(".", ",")
-                print(f"Producto: {product.strip()}, Precio: ${formatted_price}")
+            if print_products:
+                for product, price in zip(products, prices):
+                    print(f"Producto: {product.strip()}, Precio: {format_price(price)}")
+        if not all_products:
+            return
         # if categories_search:
         producto_precios = {}
-        for product, price in zip(all_products, all_prices):
-            formatted_price = price.replace(".", ",")
+        for product, price, item_id in zip(all_products, all_prices, all_ids):
             product_name = product.strip()
 
             # Si el producto ya está en el diccionario, agregar el precio a la lista
             if product_name in producto_precios:
-                producto_precios[product_name]["Precio"].append(f"${formatted_price}")
+                producto_precios[product_name]["Precio"].append(price)
+                producto_precios[product_name]["Id"].append(item_id)
             else:
                 # Si no está, agregar el producto con el precio inicial
-                producto_precios[product_name] = {"Precio": [f"${formatted_price}"]}
+                producto_precios[product_name] = {
+                    "Precio": [price],
+                    "Id": [item_id],
+                }
         return producto_precios
 
-    except requests.exceptions.ConnectTimeout as error:
+    except requests.exceptions.RequestException as error:
         print("Error de conexión", error)
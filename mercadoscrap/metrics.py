@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Prefijo de todas las métricas en el archivo de Prometheus
+PREFIX = "mercadoscrap"
+
+# Límites superiores (en segundos) de los baldes de los histogramas de tiempos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Baldes del parseo: una página se parsea en menos de un milisegundo, así que con
+# LATENCY_BUCKETS caerían todas en el primero
+PARSE_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+)
+
+# Histogramas que no usan LATENCY_BUCKETS: nombre -> baldes
+HISTOGRAM_BUCKETS = {"parse_seconds": PARSE_BUCKETS}
+
+# Métricas conocidas: nombre -> (tipo, descripción)
+METRICS = {
+    "fetch_seconds": ("histogram", "Latencia de cada URL descargada, con reintentos"),
+    "fetch_requests_total": ("counter", "URLs descargadas, por código HTTP"),
+    "fetch_retries_total": ("counter", "Reintentos de solicitudes HTTP"),
+    "fetch_bytes_total": ("counter", "Bytes de HTML descargados"),
+    "cache_hits_total": ("counter", "Páginas servidas desde la caché"),
+    "parse_seconds": ("histogram", "Tiempo de parseo de cada página de resultados"),
+    "records_total": ("counter", "Publicaciones con precio extraídas"),
+    "duplicates_total": (
+        "counter",
+        "Publicaciones ya vistas en la corrida, salteadas antes de guardar",
+    ),
+    "unchanged_pages_total": (
+        "counter",
+        "Páginas sin cambios en el modo vigilancia (304 o la misma huella)",
+    ),
+    "db_batch_seconds": ("histogram", "Tiempo de cada tanda escrita en la base"),
+    "db_rows_total": ("counter", "Publicaciones enviadas a la base"),
+    "archive_bytes_total": (
+        "counter",
+        "Bytes comprimidos agregados al archivo de HTML",
+    ),
+    "records_per_second": ("gauge", "Publicaciones extraídas por segundo de corrida"),
+}
+
+
+class Histogram:
+    """Histograma acumulativo, por defecto con los baldes de `LATENCY_BUCKETS`"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(límite, cantidad acumulada)], terminando en +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def _labels_key(labels: dict):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    """Etiquetas en formato Prometheus: {nombre="valor",...}"""
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _display_name(name: str, key) -> str:
+    """Nombre legible para el snapshot: nombre{etiqueta=valor,...}"""
+    if not key:
+        return name
+    return name + "{" + ",".join(f"{label}={value}" for label, value in key) + "}"
+
+
+class Metrics:
+    """
+    Métricas de una corrida: contadores e histogramas con etiquetas, más un log
+    estructurado opcional.
+
+    Si se le pasa `log_path`, cada `event` se agrega a ese archivo como una línea JSON
+    (con la hora y el nombre del evento). `to_prometheus` / `write_prometheus` vuelcan
+    las métricas en el formato de texto de Prometheus, por ejemplo para el textfile
+    collector de node_exporter. Se puede usar desde varios hilos a la vez.
+    """
+
+    def __init__(self, log_path: str = None):
+        self.start = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._log = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                buckets = HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS)
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Mide el bloque y lo agrega al histograma `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def event(self, name: str, **fields):
+        """Escribe una línea JSON en el log estructurado, si hay uno configurado"""
+        if self._log is None:
+            return
+        line = json.dumps(
+            {"ts": round(time.time(), 3), "evento": name, **fields},
+            ensure_ascii=False,
+            default=str,
+        )
+        with self._lock:
+            self._log.write(line + "\n")
+            self._log.flush()
+
+    def counter(self, name: str) -> float:
+        """Suma de un contador sobre todas sus etiquetas"""
+        with self._lock:
+            return sum(
+                value for (key, _), value in self.counters.items() if key == name
+            )
+
+    def snapshot(self) -> dict:
+        """Resumen de las métricas como diccionario (para el log o para imprimir)"""
+        elapsed = time.time() - self.start
+        with self._lock:
+            counters = {
+                _display_name(name, key): value
+                for (name, key), value in self.counters.items()
+            }
+            histograms = {
+                _display_name(name, key): {
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "mean": round(histogram.sum / histogram.count, 6),
+                }
+                for (name, key), histogram in self.histograms.items()
+                if histogram.count
+            }
+        records = self.counter("records_total")
+        return {
+            "segundos": round(elapsed, 3),
+            "records_per_second": round(records / elapsed, 3) if elapsed else 0,
+            "contadores": counters,
+            "histogramas": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        elapsed = time.time() - self.start
+        records = self.counter("records_total")
+        lines = []
+        with self._lock:
+            names = sorted(
+                {name for name, _ in self.counters}
+                | {name for name, _ in self.histograms}
+            )
+            for name in names:
+                kind, description = METRICS.get(name, ("untyped", name))
+                full_name = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {full_name} {description}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{full_name}{_format_labels(labels)} {value}")
+                for (metric, labels), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0]
+                ):
+                    if metric != name:
+                        continue
+                    for bound, count in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(
+                            f"{full_name}_bucket"
+                            f"{_format_labels(labels, [('le', le)])} {count}"
+                        )
+                    lines.append(
+                        f"{full_name}_sum{_format_labels(labels)} {histogram.sum}"
+                    )
+                    lines.append(
+                        f"{full_name}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        kind, description = METRICS["records_per_second"]
+        full_name = f"{PREFIX}_records_per_second"
+        lines.append(f"# HELP {full_name} {description}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        lines.append(f"{full_name} {records / elapsed if elapsed else 0}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Escribe las métricas en `path` de forma atómica (archivo temporal + rename)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Devuelve las Metrics compartidas por todo el proceso, creándolas si hace falta"""
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+        return _default_metrics
+
+
+def set_metrics(metrics: Metrics):
+    """Reemplaza las Metrics compartidas (por ejemplo, por unas con log a archivo)"""
+    global _default_metrics
+    with _default_lock:
+        _default_metrics = metrics
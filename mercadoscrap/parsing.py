@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Procesos parseadores por defecto (0 = se parsea en el mismo hilo que descarga)
+PARSER_WORKERS = 0
+
+# Páginas en cola o en proceso por cada parseador, sumando todas las categorías
+QUEUE_PER_WORKER = 4
+
+# Cómo se crean los procesos: "spawn" no hereda los hilos de descarga ni sus locks
+START_METHOD = "spawn"
+
+
+class ParserPool:
+    """
+    Pool de procesos para parsear HTML fuera del GIL.
+
+    Los hilos de descarga le pasan el HTML crudo y `workers` procesos lo parsean en
+    paralelo. La cola es acotada: entre todos los que lo usan nunca hay más de
+    `queue_size` páginas esperando o en proceso, y `submit` bloquea hasta que se libere
+    un lugar, así las descargas no se adelantan más de lo que se llega a parsear.
+    Los procesos se crean la primera vez que se usa el pool.
+    """
+
+    def __init__(self, workers: int = None, queue_size: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or QUEUE_PER_WORKER * self.workers
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(START_METHOD),
+                )
+            return self._executor
+
+    def submit(self, function, *args):
+        """Encola `function(*args)` en un proceso, esperando lugar en la cola"""
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def map(self, function, items, window: int = None):
+        """Aplica `function` a cada elemento de `items` y devuelve los resultados en orden.
+
+        `items` se consume a medida que hay lugar: se adelantan como mucho `window`
+        elementos (por defecto `queue_size`), así un iterador de descargas sigue
+        bajando páginas mientras los procesos parsean las anteriores.
+        """
+        window = window or self.queue_size
+        pending = deque()
+        for item in items:
+            pending.append(self.submit(function, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_parser_pool():
+    """Devuelve el ParserPool compartido, o None si se parsea en el mismo hilo"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None and PARSER_WORKERS:
+            _default_pool = ParserPool(PARSER_WORKERS)
+        return _default_pool
+
+
+def set_parser_pool(pool):
+    """Reemplaza el ParserPool compartido (None para volver a parsear en el hilo)"""
+    global _default_pool
+    with _default_lock:
+        _default_pool = pool
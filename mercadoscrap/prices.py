@@ -0,0 +1,52 @@
+import re
+
+# Caracteres que sobran en la fracción de un precio de Mercado Libre ("1.234"): los
+# separadores de miles y los espacios
+_DROP_SEPARATORS = str.maketrans("", "", ". \xa0")
+
+# Un precio con formato: símbolo opcional, parte entera con separadores y, si el último
+# separador va seguido de 1 o 2 dígitos, decimales
+_PRICE_PATTERN = re.compile(r"^\s*\$?\s*([\d.,\s\xa0]*?)(?:[.,](\d{1,2}))?\s*$")
+
+
+def parse_prices(fractions, cents=None) -> list:
+    """
+    Convierte una columna de precios de Mercado Libre a centavos enteros.
+
+    `fractions` son los textos de `andes-money-amount__fraction` ("1.234") y `cents`
+    los de `andes-money-amount__cents` ("50", o None/"" si la tarjeta no los tiene),
+    alineados. Cada fila se convierte por separado: un texto que no es un número lanza
+    ValueError y nunca corre el precio de las filas siguientes a otra tarjeta.
+    """
+    pesos = [int(fraction.translate(_DROP_SEPARATORS)) for fraction in fractions]
+    if cents is None:
+        return [peso * 100 for peso in pesos]
+    cents = list(cents)
+    if len(cents) != len(pesos):
+        raise ValueError(
+            f"{len(pesos)} fracciones y {len(cents)} centavos: no están alineados"
+        )
+    return [peso * 100 + (int(cent) if cent else 0) for peso, cent in zip(pesos, cents)]
+
+
+def parse_price(text: str) -> int:
+    """
+    Convierte un precio con formato ("$1.234,50", "$1,234", "1234.5") a centavos.
+
+    Si el último separador (punto o coma) está seguido de uno o dos dígitos son los
+    decimales; cualquier otro separador es de miles.
+    """
+    match = _PRICE_PATTERN.match(text)
+    if not match or not match.group(1).strip(",. \xa0"):
+        raise ValueError(f"Precio inválido: {text!r}")
+    integer, decimals = match.groups()
+    pesos = int(integer.replace(",", "").translate(_DROP_SEPARATORS))
+    cents = int(decimals.ljust(2, "0")) if decimals else 0
+    return pesos * 100 + cents
+
+
+def format_price(cents: int) -> str:
+    """Formatea centavos como en Mercado Libre: "$1.234" o "$1.234,50" """
+    pesos, cents = divmod(cents, 100)
+    text = f"${pesos:,}".replace(",", ".")
+    return f"{text},{cents:02d}" if cents else text
@@ -0,0 +1,167 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Solicitudes simultáneas por host al arrancar, y sus límites
+INITIAL_LIMIT = 8
+MIN_LIMIT = 1
+MAX_LIMIT = 32
+
+# AIMD: cada respuesta buena suma ADDITIVE_INCREASE/límite (≈ ADDITIVE_INCREASE por
+# "ventana" completa) y cada señal de sobrecarga multiplica el límite por DECREASE_FACTOR
+ADDITIVE_INCREASE = 0.5
+DECREASE_FACTOR = 0.5
+
+# Códigos que indican que el host nos está frenando
+THROTTLE_STATUS = {429, 503}
+
+# Una respuesta cuenta como lenta si tarda más que LATENCY_FACTOR veces la latencia
+# base del host (la mínima observada), y nunca por debajo de LATENCY_FLOOR segundos
+LATENCY_FACTOR = 4
+LATENCY_FLOOR = 1.0
+
+# Timeout adaptativo: TIMEOUT_FACTOR veces la latencia media del host, entre
+# MIN_TIMEOUT y el timeout fijo del Fetcher
+TIMEOUT_FACTOR = 10
+MIN_TIMEOUT = 10
+
+# Pausa máxima que aceptamos de un Retry-After (en segundos)
+RETRY_AFTER_MAX = 120
+
+# Peso de cada nueva muestra en la latencia media (EWMA)
+EWMA_WEIGHT = 0.2
+
+
+def parse_retry_after(value, now: float = None):
+    """Segundos a esperar según un header Retry-After (segundos o fecha HTTP), o None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment.timestamp() - (time.time() if now is None else now))
+
+
+class HostLimiter:
+    """
+    Límite adaptativo de solicitudes simultáneas para un host.
+
+    `acquire` bloquea mientras haya `limit` solicitudes en vuelo o el host esté en
+    pausa por un Retry-After. `release` ajusta el límite con AIMD: sube de a poco con
+    cada respuesta buena y se corta a la mitad ante un 429/503, un error de red o una
+    respuesta lenta. El corte se aplica una sola vez por tanda: las respuestas de
+    solicitudes que salieron antes del último corte no lo vuelven a bajar.
+    """
+
+    def __init__(
+        self,
+        initial: float = INITIAL_LIMIT,
+        minimum: float = MIN_LIMIT,
+        maximum: float = MAX_LIMIT,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.base_latency = None
+        self.latency = None
+        self.throttled = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Espera un lugar y devuelve el momento en que salió la solicitud"""
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < max(int(self.limit), 1):
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, sent_at: float, status, latency: float, retry_after=None):
+        """Libera el lugar y ajusta el límite según el resultado de la solicitud"""
+        with self._cond:
+            self.in_flight -= 1
+            overloaded = status is None or status in THROTTLE_STATUS
+            if status is not None and status < 500:
+                self._observe_latency(latency)
+                if latency > self.slow_threshold():
+                    overloaded = True
+
+            if retry_after:
+                self.paused_until = max(
+                    self.paused_until,
+                    time.monotonic() + min(retry_after, RETRY_AFTER_MAX),
+                )
+            if overloaded:
+                self.throttled += 1
+                if sent_at >= self.last_decrease:
+                    self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+                    self.last_decrease = time.monotonic()
+            elif status is not None and status < 400:
+                self.limit = min(
+                    self.maximum, self.limit + ADDITIVE_INCREASE / self.limit
+                )
+            self._cond.notify_all()
+
+    def _observe_latency(self, latency: float):
+        if self.base_latency is None or latency < self.base_latency:
+            self.base_latency = latency
+        self.latency = (
+            latency
+            if self.latency is None
+            else (1 - EWMA_WEIGHT) * self.latency + EWMA_WEIGHT * latency
+        )
+
+    def slow_threshold(self) -> float:
+        if self.base_latency is None:
+            return float("inf")
+        return max(LATENCY_FLOOR, LATENCY_FACTOR * self.base_latency)
+
+    def timeout(self, default: float) -> float:
+        """Timeout para la próxima solicitud, según la latencia media del host"""
+        if self.latency is None:
+            return default
+        return min(default, max(MIN_TIMEOUT, TIMEOUT_FACTOR * self.latency))
+
+
+class AdaptiveController:
+    """
+    Un `HostLimiter` por host, creado la primera vez que se le pide una URL de ese host.
+
+    Lo usa `fetcher.Fetcher` alrededor de cada intento de descarga.
+    """
+
+    def __init__(self, **limits):
+        self.limits = limits
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url: str) -> HostLimiter:
+        netloc = urlsplit(url).netloc.lower()
+        with self._lock:
+            limiter = self.hosts.get(netloc)
+            if limiter is None:
+                limiter = self.hosts[netloc] = HostLimiter(**self.limits)
+            return limiter
+
+    def summary(self) -> dict:
+        """Límite actual, solicitudes frenadas y latencia media de cada host"""
+        with self._lock:
+            hosts = dict(self.hosts)
+        return {
+            netloc: {
+                "limite": round(limiter.limit, 2),
+                "frenadas": limiter.throttled,
+                "latencia": round(limiter.latency, 4) if limiter.latency else None,
+            }
+            for netloc, limiter in hosts.items()
+        }
@@ -0,0 +1,135 @@
+"""
+Vuelve a extraer una corrida desde el archivo de HTML, sin salir a la red.
+
+Lee las páginas que `main.py --archive` guardó de la corrida, las descomprime y las
+parsea con los extractores actuales en varios procesos, y guarda las publicaciones en
+la misma corrida (lo que ya estaba guardado no se duplica). Sirve para recuperar los
+datos de una corrida en la que el markup de Mercado Libre había cambiado y los
+extractores de ese momento no encontraron nada.
+
+    python reextract.py 42
+    python reextract.py 42 --archive /datos/archivo --parsers 8 --dry-run
+"""
+
+import argparse
+import itertools
+import time
+
+from archive import ARCHIVE_DIR, ArchiveReader, decompress_page
+from database import insert_listings
+from dedup import ListingIndex
+from mercadolibre import parse_page
+from parsing import ParserPool
+
+
+def parse_archived(record):
+    """Descomprime y parsea una página archivada (categoría, página, datos); corre en
+    los procesos del pool, así al pool solo viajan los bytes comprimidos"""
+    categoria, pagina, data = record
+    url, html = decompress_page(data)
+    return (categoria,) + parse_page((pagina, url, html))
+
+
+def reextract(
+    corrida_id: int,
+    directory: str = ARCHIVE_DIR,
+    workers: int = None,
+    dry_run: bool = False,
+    dedup: bool = True,
+    categorias=None,
+):
+    """Reparsea las páginas archivadas de la corrida y las guarda en ella.
+
+    Con `dry_run` solo parsea y cuenta. `categorias` limita a esas categorías.
+    Devuelve {categoría: publicaciones encontradas}.
+    """
+    reader = ArchiveReader(corrida_id, directory)
+    entries = [
+        entry
+        for entry in reader.entries()
+        if entry.categoria and (not categorias or entry.categoria in categorias)
+    ]
+    entries.sort(key=lambda entry: (entry.categoria, entry.pagina or 0))
+    print(f"Corrida {corrida_id}: {len(entries)} páginas archivadas")
+
+    pool = ParserPool(workers)
+    seen = ListingIndex() if dedup else None
+    totales = {}
+    start = time.perf_counter()
+    try:
+        parsed = pool.map(
+            parse_archived,
+            ((entry.categoria, entry.pagina, reader.read(entry)) for entry in entries),
+        )
+        for categoria, pages in itertools.groupby(parsed, key=lambda page: page[0]):
+            listings = (
+                listing
+                for _, _, _, page_listings, _, _ in pages
+                for listing in (
+                    seen.filter(page_listings) if seen is not None else page_listings
+                )
+            )
+            if dry_run:
+                totales[categoria] = sum(1 for _ in listings)
+            else:
+                totales[categoria] = insert_listings(
+                    categoria, listings, corrida_id=corrida_id
+                )
+            print(f"{categoria}: {totales[categoria]} publicaciones")
+    finally:
+        pool.close()
+        reader.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(entries)} páginas en {elapsed:.1f} s "
+        f"({len(entries) / elapsed if elapsed else 0:.0f} páginas/s, "
+        f"{pool.workers} procesos)"
+    )
+    return totales
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corrida", type=int, help="Id de la corrida a reextraer")
+    parser.add_argument(
+        "--archive",
+        default=ARCHIVE_DIR,
+        help=f"Carpeta del archivo de HTML (por defecto {ARCHIVE_DIR})",
+    )
+    parser.add_argument(
+        "--parsers",
+        type=int,
+        default=None,
+        help="Procesos parseadores (por defecto, uno por núcleo)",
+    )
+    parser.add_argument(
+        "--categoria",
+        action="append",
+        default=None,
+        help="Reextrae solo esta categoría (se puede repetir)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Solo parsea y cuenta, sin escribir en la base",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        dest="dedup",
+        action="store_false",
+        help="Guarda cada publicación en todas las categorías donde aparece",
+    )
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    reextract(
+        args.corrida,
+        directory=args.archive,
+        workers=args.parsers,
+        dry_run=args.dry_run,
+        dedup=args.dedup,
+        categorias=args.categoria,
+    )
@@ -0,0 +1,56 @@
+"""
+Guarda los gráficos de la base en archivos, sin display ni Qt.
+
+Dibuja cada gráfico de `DataVisualizer` en PNG y SVG, en procesos aparte. Los gráficos
+cuyos datos no cambiaron desde la última vez (misma última corrida y mismos totales)
+no se vuelven a dibujar, así se puede correr después de cada scrapeo sin costo.
+
+    python report.py
+    python report.py /srv/www/reportes --formatos png --force
+"""
+
+import argparse
+
+from database import DB_URL
+from visualizer import REPORT_DIR, REPORT_FORMATS, DataVisualizer
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "carpeta",
+        nargs="?",
+        default=REPORT_DIR,
+        help=f"Carpeta de los gráficos (por defecto {REPORT_DIR})",
+    )
+    parser.add_argument(
+        "--db", default=DB_URL, help=f"URL de la base (por defecto {DB_URL})"
+    )
+    parser.add_argument(
+        "--formatos",
+        nargs="+",
+        default=list(REPORT_FORMATS),
+        help=f"Formatos de cada gráfico (por defecto {' '.join(REPORT_FORMATS)})",
+    )
+    parser.add_argument(
+        "--procesos",
+        type=int,
+        default=None,
+        help="Procesos que dibujan (por defecto, uno por gráfico)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Dibuja todos los gráficos aunque los datos no hayan cambiado",
+    )
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    DataVisualizer(args.db).render_report(
+        args.carpeta,
+        formats=args.formatos,
+        workers=args.procesos,
+        force=args.force,
+    )
@@ -0,0 +1,20 @@
+"""
+Punto de entrada headless: scrapea y guarda en la base, sin gráficos ni Qt.
+
+Siempre usa el modo streaming, así cada categoría queda guardada a medida que se
+scrapea. Acepta las mismas opciones que main.py (--cache, --replay, --resume, --parquet,
+--log-json, --metrics, --parsers, ...). Con --report los gráficos se guardan en
+archivos, sin display.
+
+    python scrape.py "cuchara madera"
+    python scrape.py --batch busquedas.txt
+"""
+
+from main import parse_args, run
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Siempre en streaming y sin mostrar gráficos
+    args.stream = True
+    args.plots = False
+    run(args)
@@ -1,62 +1,469 @@
-import pandas as pd
-import seaborn as sns
-import matplotlib
-import matplotlib.pyplot as plt
-from sqlalchemy import create_engine
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-matplotlib.use("QtAgg")
+from sqlalchemy import create_engine, func, inspect, select
+
+from database import (
+    Categoria,
+    Corrida,
+    Producto,
+    ResumenCategoria,
+    ResumenCorrida,
+    get_engine,
+)
+from sketch import PriceSketch
+
+# Filas por tanda cuando hace falta leer el detalle de los productos
+CHUNKSIZE = 50_000
+
+# Backend de matplotlib para mostrar los gráficos en pantalla
+MATPLOTLIB_BACKEND = "QtAgg"
+
+# Backend de matplotlib sin display, para guardar los gráficos del reporte
+HEADLESS_BACKEND = "Agg"
+
+# Carpeta por defecto del reporte
+REPORT_DIR = "reports"
+
+# Formatos en los que se guarda cada gráfico del reporte
+REPORT_FORMATS = ("png", "svg")
+
+# Archivo del reporte con la versión de los datos de cada gráfico ya dibujado
+REPORT_MANIFEST = "report.json"
+
+# Cómo se crean los procesos que dibujan: "spawn" arranca cada uno con un matplotlib
+# limpio, sin heredar el backend Qt ni los hilos del proceso que llama
+RENDER_START_METHOD = "spawn"
+
+# Categorías que se muestran en la torta; el resto se agrupa en "Otros"
+PIE_CATEGORIES = 3
+
+# Escalas de las etiquetas de precio: (desde, divisor, sufijo), de mayor a menor
+PRICE_SCALES = (
+    (1_000_000_000, 1_000_000_000, "B $"),  # Billones
+    (1_000_000, 1_000_000, "M $"),  # Millones
+    (1_000, 1_000, "K $"),  # Miles
+)
+
+
+def _pyplot(backend: str = None):
+    """Importa matplotlib y seaborn recién cuando se va a graficar.
+
+    Son las dependencias más pesadas del proyecto y el backend Qt necesita un display,
+    así que no las cargamos al importar el módulo.
+    """
+    import matplotlib
+
+    matplotlib.use(backend or MATPLOTLIB_BACKEND)
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    return plt, sns
+
+
+def scale_prices(precios):
+    """Etiquetas legibles ("1.5M $") de una serie de precios, sin recorrerla en Python"""
+    import numpy as np
+
+    precios = np.asarray(precios, dtype=float)
+    conditions = [precios >= desde for desde, _, _ in PRICE_SCALES]
+    divisor = np.select(conditions, [d for _, d, _ in PRICE_SCALES], 1)
+    suffix = np.select(conditions, [s for _, _, s in PRICE_SCALES], " $")
+    number = np.where(
+        divisor > 1,
+        np.char.mod("%.1f", precios / divisor),
+        np.char.mod("%.0f", precios),
+    )
+    return np.char.add(number, suffix)
+
+
+def figure_suma_precios(df_suma, plt, sns):
+    """Arma el gráfico de barras de la suma de precios por categoría y devuelve la figura"""
+    fig, ax = plt.subplots(figsize=(12, 6))
+    colors = sns.color_palette("husl", len(df_suma))
+    bars = ax.bar(df_suma["categoria"], df_suma["precio"], color=colors)
+
+    ax.set_title("Suma de precios por categoría")
+    ax.set_xlabel("Categoría")
+    ax.set_ylabel("Suma de Precios")
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+
+    # Todas las etiquetas de una vez, sobre cada barra
+    ax.bar_label(
+        bars,
+        labels=scale_prices(df_suma["precio"]),
+        padding=3,
+        color="black",
+        fontsize=10,
+    )
+    ax.margins(y=0.1)
+
+    fig.tight_layout()
+    return fig
+
+
+def figure_distribucion_categorias(df_count, plt, sns):
+    """Arma la torta de productos por categoría y devuelve la figura"""
+    import pandas as pd
+
+    # Ordenar las categorías por cantidad en orden descendente
+    df_count = df_count.sort_values(by="cantidad", ascending=False)
+
+    if len(df_count) > PIE_CATEGORIES:
+        # Seleccionar las primeras `PIE_CATEGORIES` categorías y agrupar el resto en
+        # "Otros"
+        top_categories = pd.concat(
+            [
+                df_count.head(PIE_CATEGORIES),
+                pd.DataFrame(
+                    {
+                        "categoria": ["Otros"],
+                        "cantidad": [df_count["cantidad"].iloc[PIE_CATEGORIES:].sum()],
+                    }
+                ),
+            ],
+            ignore_index=True,
+        )
+    else:
+        # Si hay pocas categorías, mostrar todas
+        top_categories = df_count
+
+    # Configuración del gráfico de torta
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    # Crear el gráfico de torta con colores personalizados
+    colors = sns.color_palette("husl", len(top_categories))
+    ax.pie(
+        top_categories["cantidad"],
+        labels=list(top_categories["categoria"]),
+        colors=colors,
+        autopct="%1.1f%%",
+        startangle=140,
+    )
+
+    # Añadir leyenda con cantidades
+    labels = top_categories["categoria"] + ": " + top_categories["cantidad"].astype(str)
+    ax.legend(
+        list(labels), title="Categorías", bbox_to_anchor=(1.05, 1), loc="upper left"
+    )
+
+    # Añadir título
+    ax.set_title("Distribución de productos por categoría")
+
+    # Ajustar el diseño
+    fig.tight_layout()
+    return fig
+
+
+# Gráficos del reporte: nombre -> (función que arma la figura, método con los datos)
+CHARTS = {
+    "suma_precios": (figure_suma_precios, "suma_precios_por_categoria"),
+    "distribucion_categorias": (
+        figure_distribucion_categorias,
+        "productos_por_categoria",
+    ),
+}
+
+
+def render_chart(task):
+    """Dibuja un gráfico del reporte (nombre, datos, archivos) sin display y lo guarda
+    en cada archivo. Corre en los procesos de `DataVisualizer.render_report`; devuelve
+    (nombre, segundos)."""
+    name, data, paths = task
+    start = time.perf_counter()
+    plt, sns = _pyplot(HEADLESS_BACKEND)
+    fig = CHARTS[name][0](data, plt, sns)
+    try:
+        for path in paths:
+            fig.savefig(path)
+    finally:
+        plt.close(fig)
+    return name, time.perf_counter() - start
 
 
 class DataVisualizer:
     """
     Clase para la visualización y análisis de datos extraídos de una base de datos.
 
-    Esta clase se conecta a una base de datos SQL utilizando una URL proporcionada,
-    lee las tablas de 'productos' y 'categorias', y fusiona estos datos en un solo DataFrame.
-    Luego, proporciona métodos para generar gráficos y análisis de los datos.
+    Esta clase se conecta a una base de datos SQL utilizando una URL proporcionada y
+    resuelve los gráficos desde la tabla 'resumen_categorias', que se mantiene al
+    insertar productos, así el costo depende de la cantidad de categorías y corridas y
+    no del tamaño de la tabla 'productos'.
+    Las tablas de 'productos' y 'categorias' se siguen pudiendo leer fila por fila, en
+    tandas con `iter_productos` o completas con `merged_df`.
 
     Attributes:
-        conn (sqlalchemy.engine.base.Connection): Conexión a la base de datos SQL.
-        productos_df (pandas.DataFrame): DataFrame que contiene los datos de la tabla 'productos'.
-        categorias_df (pandas.DataFrame): DataFrame que contiene los datos de la tabla 'categorias'.
-        merged_df (pandas.DataFrame): DataFrame combinado que fusiona 'productos_df' y 'categorias_df'.
+        conn (sqlalchemy.engine.Engine): Conexión a la base de datos SQL.
+        productos_df (pandas.DataFrame): Tabla 'productos' completa (se lee al usarla).
+        categorias_df (pandas.DataFrame): Tabla 'categorias' completa (se lee al usarla).
+        merged_df (pandas.DataFrame): 'productos' y 'categorias' fusionadas (se lee al usarla).
     """
 
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, chunksize: int = CHUNKSIZE):
         """
         Inicializa la clase DataVisualizer y establece la conexión con la base de datos.
 
         Args:
             db_url (str): URL de la base de datos en formato SQLAlchemy.
+            chunksize (int): Filas por tanda al leer datos fila por fila.
 
         Raises:
             ValueError: Si no se proporciona una URL de base de datos.
-            Exception: Si ocurre un error al conectar con la base de datos o leer las tablas.
+            Exception: Si ocurre un error al conectar con la base de datos o faltan las tablas.
         """
         if not db_url:
             raise ValueError("La URL de la base de datos no puede estar vacía.")
 
+        self.chunksize = chunksize
+        self._merged_df = None
         try:
-            # Conectar a la base de datos
-            self.conn = create_engine(db_url)
-            # Leer los datos de las tablas
-            self.productos_df = pd.read_sql_table("productos", self.conn)
-            self.categorias_df = pd.read_sql_table("categorias", self.conn)
-            # Fusionar las tablas productos y categorias
-            self.merged_df = pd.merge(
-                self.productos_df,
-                self.categorias_df,
-                left_on="categoria_id",
-                right_on="id",
-            )
+            # Verificar que estén las tablas antes de que get_engine cree las que falten
+            engine = create_engine(db_url)
+            tablas = inspect(engine).get_table_names()
+            engine.dispose()
+            for tabla in ("productos", "categorias"):
+                if tabla not in tablas:
+                    raise ValueError(f"No existe la tabla '{tabla}'")
+            # get_engine crea (y llena, si la base es anterior) la tabla de resumen
+            self.conn = get_engine(db_url)
         except Exception as e:
             raise Exception(
                 f"Error al conectar con la base de datos o leer las tablas: {e}"
             )
 
-        # Verificar la estructura del DataFrame combinado
-        print(self.merged_df.head())
-        print("***********" * 6)
+    def _read_sql(self, query):
+        import pandas as pd
+
+        with self.conn.connect() as conn:
+            return pd.read_sql(query, conn)
+
+    def suma_precios_por_categoria(self):
+        """DataFrame (categoria, precio) con la suma de precios de cada categoría"""
+        return self._read_sql(
+            select(
+                Categoria.nombre.label("categoria"),
+                func.sum(ResumenCategoria.suma).label("precio"),
+            )
+            .join(Categoria, Categoria.id == ResumenCategoria.categoria_id)
+            .group_by(Categoria.nombre)
+            .order_by(Categoria.nombre)
+        )
+
+    def productos_por_categoria(self):
+        """DataFrame (categoria, cantidad) con la cantidad de productos de cada categoría"""
+        return self._read_sql(
+            select(
+                Categoria.nombre.label("categoria"),
+                func.sum(ResumenCategoria.cantidad).label("cantidad"),
+            )
+            .join(Categoria, Categoria.id == ResumenCategoria.categoria_id)
+            .group_by(Categoria.nombre)
+            .order_by(Categoria.nombre)
+        )
+
+    def resumen_por_categoria(self, corrida_id: int = None, percentiles=(0.5, 0.9)):
+        """
+        DataFrame con cantidad, suma, mínimo, máximo y percentiles de cada categoría.
+
+        Combina los sketches guardados de cada corrida, así que no lee productos. Los
+        percentiles son aproximados (ver `sketch.PriceSketch`) y las columnas se llaman
+        p50, p90, etc. Sin `corrida_id` resume lo guardado en productos; con
+        `corrida_id`, todas las publicaciones que vio esa corrida, estuvieran o no
+        guardadas de antes (ver `ResumenCorrida`).
+        """
+        import pandas as pd
+
+        tabla = ResumenCategoria if corrida_id is None else ResumenCorrida
+        query = select(
+            Categoria.nombre,
+            tabla.cantidad,
+            tabla.suma,
+            tabla.minimo,
+            tabla.maximo,
+            tabla.sketch,
+        ).join(Categoria, Categoria.id == tabla.categoria_id)
+        if corrida_id is not None:
+            query = query.where(tabla.corrida_id == corrida_id)
+
+        resumen = {}
+        with self.conn.connect() as conn:
+            for nombre, cantidad, suma, minimo, maximo, sketch in conn.execute(query):
+                fila = resumen.get(nombre)
+                if fila is None:
+                    resumen[nombre] = [
+                        cantidad,
+                        suma,
+                        minimo,
+                        maximo,
+                        PriceSketch.from_json(sketch),
+                    ]
+                    continue
+                fila[0] += cantidad
+                fila[1] += suma
+                fila[2] = min(fila[2], minimo)
+                fila[3] = max(fila[3], maximo)
+                fila[4].merge(PriceSketch.from_json(sketch))
+
+        return pd.DataFrame(
+            [
+                {
+                    "categoria": nombre,
+                    "cantidad": cantidad,
+                    "suma": suma,
+                    "minimo": minimo,
+                    "maximo": maximo,
+                    **{f"p{q * 100:g}": sketch.quantile(q) for q in percentiles},
+                }
+                for nombre, (cantidad, suma, minimo, maximo, sketch) in sorted(
+                    resumen.items()
+                )
+            ],
+            columns=["categoria", "cantidad", "suma", "minimo", "maximo"]
+            + [f"p{q * 100:g}" for q in percentiles],
+        )
+
+    def iter_productos(self, chunksize: int = None):
+        """
+        Lee los productos con su categoría en tandas de `chunksize` filas.
+
+        Para los análisis que necesitan el detalle fila por fila sin cargar toda la tabla.
+        Las columnas son las mismas que las de `merged_df`.
+        """
+        import pandas as pd
+
+        query = select(
+            Producto.id.label("id_x"),
+            Producto.nombre.label("nombre_x"),
+            Producto.precio,
+            Producto.fecha_agregado,
+            Producto.categoria_id,
+            Categoria.id.label("id_y"),
+            Categoria.nombre.label("nombre_y"),
+        ).join(Categoria, Categoria.id == Producto.categoria_id)
+        with self.conn.connect() as conn:
+            yield from pd.read_sql(query, conn, chunksize=chunksize or self.chunksize)
+
+    @property
+    def productos_df(self):
+        import pandas as pd
+
+        return pd.read_sql_table("productos", self.conn)
+
+    @property
+    def categorias_df(self):
+        import pandas as pd
+
+        return pd.read_sql_table("categorias", self.conn)
+
+    @property
+    def merged_df(self):
+        import pandas as pd
+
+        if self._merged_df is None:
+            chunks = list(self.iter_productos())
+            self._merged_df = (
+                pd.concat(chunks, ignore_index=True)
+                if chunks
+                else pd.DataFrame(
+                    columns=[
+                        "id_x",
+                        "nombre_x",
+                        "precio",
+                        "fecha_agregado",
+                        "categoria_id",
+                        "id_y",
+                        "nombre_y",
+                    ]
+                )
+            )
+        return self._merged_df
+
+    def data_version(self) -> str:
+        """
+        Clave de la versión de los datos que grafica el reporte.
+
+        Es la última corrida más los totales de 'resumen_categorias', así cambia con
+        cada corrida nueva y con cada producto guardado (también fuera de una corrida),
+        y se calcula con una sola consulta sin leer los datos de los gráficos.
+        """
+        with self.conn.connect() as conn:
+            corrida = conn.execute(select(func.max(Corrida.id))).scalar()
+            filas, cantidad, suma = conn.execute(
+                select(
+                    func.count(),
+                    func.sum(ResumenCategoria.cantidad),
+                    func.sum(ResumenCategoria.suma),
+                )
+            ).one()
+        return f"{corrida or 0}-{filas}-{cantidad or 0}-{suma or 0:.2f}"
+
+    def render_report(
+        self,
+        directory: str = REPORT_DIR,
+        formats=REPORT_FORMATS,
+        workers: int = None,
+        force: bool = False,
+    ) -> dict:
+        """
+        Guarda todos los gráficos en `directory`, sin display, uno por archivo y formato.
+
+        Los gráficos se dibujan en paralelo en procesos aparte (hasta `workers`, por
+        defecto uno por gráfico, ver `RENDER_START_METHOD`). Cada
+        gráfico queda anotado en `REPORT_MANIFEST` con la versión de los datos (ver
+        `data_version`); si los datos no cambiaron y sus archivos siguen ahí no se
+        vuelve a dibujar, salvo con `force`.
+
+        Returns:
+            dict: {gráfico: [archivos]}.
+        """
+        version = self.data_version()
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, REPORT_MANIFEST)
+        try:
+            with open(manifest_path, encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            manifest = {}
+
+        files = {
+            name: [os.path.join(directory, f"{name}.{fmt}") for fmt in formats]
+            for name in CHARTS
+        }
+        pending = [
+            name
+            for name in CHARTS
+            if force
+            or manifest.get(name) != version
+            or not all(os.path.exists(path) for path in files[name])
+        ]
+        if not pending:
+            print(f"Reporte al día (datos {version}): {directory}")
+            return files
+
+        # Los datos se leen acá: los procesos solo reciben los DataFrames chicos
+        tasks = [
+            (name, getattr(self, CHARTS[name][1])(), files[name]) for name in pending
+        ]
+        with ProcessPoolExecutor(
+            max_workers=min(workers or len(tasks), len(tasks)),
+            mp_context=multiprocessing.get_context(RENDER_START_METHOD),
+        ) as executor:
+            for name, seconds in executor.map(render_chart, tasks):
+                manifest[name] = version
+                print(f"Gráfico '{name}' dibujado en {seconds:.1f} s")
+
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, manifest_path)
+        print(
+            f"Reporte en {directory}: {len(pending)} gráficos dibujados, "
+            f"{len(CHARTS) - len(pending)} sin cambios"
+        )
+        return files
 
     def plot_suma_precios(self):
         """
@@ -71,51 +478,16 @@ class DataVisualizer:
         para mejorar la legibilidad.
         6. Muestra el gráfico ajustado para evitar el recorte de las etiquetas.
 
+        El gráfico se arma en `figure_suma_precios`, que también usa `render_report`.
+
         Args:
             self: La instancia de la clase `DataVisualizer` que contiene los datos y la conexión a la base de datos.
 
         Returns:
             None: Este método muestra el gráfico directamente y no devuelve ningún valor.
         """
-        df_suma = self.merged_df.groupby("nombre_y")["precio"].sum().reset_index()
-
-        # Escalar los precios a miles, millones o billones
-        def scale_values(value):
-            if value >= 1_000_000_000:
-                return f"{value / 1_000_000_000:.1f}B $"  # Billones
-            elif value >= 1_000_000:
-                return f"{value / 1_000_000:.1f}M $"  # Millones
-            elif value >= 1_000:
-                return f"{value / 1_000:.1f}K $"  # Miles
-            else:
-                return f"{value:.0f} $"
-
-        # Configuración del gráfico
-        plt.figure(figsize=(12, 6))
-        df_suma["precio_scaled"] = df_suma["precio"].apply(scale_values)
-        colors = sns.color_palette("husl", len(df_suma))
-        barplot = sns.barplot(x="nombre_y", y="precio", data=df_suma, palette=colors)
-
-        plt.title("Suma de precios por categoría")
-        plt.xlabel("Categoría")
-        plt.ylabel("Suma de Precios")
-
-        plt.xticks(rotation=45, ha="right")
-
-        for index, row in df_suma.iterrows():
-            barplot.text(
-                x=index,
-                y=row["precio"]
-                + 0.02
-                * df_suma["precio"].max(),  # Ajustar la posición vertical del texto
-                s=df_suma.loc[index, "precio_scaled"],  # Texto escalado
-                color="black",  # Color del texto
-                ha="center",
-                va="bottom",
-                fontsize=10,
-            )
-
-        plt.tight_layout()
+        plt, sns = _pyplot()
+        figure_suma_precios(self.suma_precios_por_categoria(), plt, sns)
         plt.show()
 
     def plot_distribucion_categorias(self):
@@ -129,68 +501,15 @@ class DataVisualizer:
         4. Ajusta la posición de los porcentajes para que sean legibles, colocándolos fuera del gráfico con líneas que los conectan a las porciones correspondientes.
         5. Añade una leyenda que muestra las cantidades de productos por categoría.
 
+        El gráfico se arma en `figure_distribucion_categorias`, que también usa
+        `render_report`.
+
         Args:
             self: La instancia de la clase `DataVisualizer` que contiene los datos y la conexión a la base de datos.
 
         Returns:
             None: Este método muestra el gráfico directamente y no devuelve ningún valor.
         """
-        df_count = self.merged_df.groupby("nombre_y")["id_x"].count().reset_index()
-        df_count.rename(columns={"id_x": "cantidad"}, inplace=True)
-
-        # Ordenar las categorías por cantidad en orden descendente
-        df_count = df_count.sort_values(by="cantidad", ascending=False)
-
-        # Número de categorías a mostrar sin agrupar
-        num_categories_to_show = 3
-
-        if len(df_count) > num_categories_to_show:
-            # Seleccionar las primeras 'num_categories_to_show' categorías
-            top_categories = df_count.head(num_categories_to_show)
-
-            # Agrupar las categorías restantes en "otros"
-            remaining_categories = df_count.iloc[num_categories_to_show:]
-            if not remaining_categories.empty:
-                otros_count = remaining_categories["cantidad"].sum()
-                # Crear un DataFrame para la categoría "otros"
-                otros_df = pd.DataFrame(
-                    {"nombre_y": ["Otros"], "cantidad": [otros_count]}
-                )
-                # Concatenar el DataFrame de las principales categorías con "otros"
-                top_categories = pd.concat(
-                    [top_categories, otros_df], ignore_index=True
-                )
-        else:
-            # Si hay 6 o menos categorías, mostrar todas
-            top_categories = df_count
-
-        # Configuración del gráfico de torta
-        plt.figure(figsize=(12, 8))
-
-        # Crear el gráfico de torta con colores personalizados
-        colors = sns.color_palette("husl", len(top_categories))
-        plt.pie(
-            top_categories["cantidad"],
-            labels=[f"{name}" for name in top_categories["nombre_y"]],
-            colors=colors,
-            autopct="%1.1f%%",
-            startangle=140,
-        )
-
-        # Añadir leyenda con cantidades
-        labels = [
-            f"{name}: {count}"
-            for name, count in zip(
-                top_categories["nombre_y"], top_categories["cantidad"]
-            )
-        ]
-        plt.legend(
-            labels, title="Categorías", bbox_to_anchor=(1.05, 1), loc="upper left"
-        )
-
-        # Añadir título
-        plt.title("Distribución de productos por categoría")
-
-        # Ajustar el diseño
-        plt.tight_layout()
+        plt, sns = _pyplot()
+        figure_distribucion_categorias(self.productos_por_categoria(), plt, sns)
         plt.show()
@@ -0,0 +1,395 @@
+"""
+Modo vigilancia: revisa las mismas búsquedas cada tanto y guarda solo lo que cambió.
+
+    python watch.py "cuchara madera"
+    python watch.py --batch busquedas.txt --intervalo 30 --intervalo-max 720
+
+Cada página de resultados tiene una huella: un hash de las publicaciones extraídas
+(id, título y precio, sin importar el orden). Las páginas se piden con GET condicional
+cuando el servidor mandó ETag o Last-Modified; si contesta 304 la página ni se parsea.
+Si la huella es la misma que la vez anterior no se escribe nada en la base.
+
+Una categoría cuya primera página no cambió no se recorre: se vuelve a revisar más
+tarde, con el intervalo duplicado por cada revisión seguida sin cambios (hasta
+`MAX_INTERVAL`). Cada `FULL_SWEEP` se recorre entera de todos modos, por si los
+cambios estaban en las páginas de atrás. Las huellas, los validadores y la agenda de
+cada categoría quedan en la base, así el proceso se puede reiniciar sin perder el
+ritmo. Cada ronda con categorías para revisar queda como una corrida.
+"""
+
+import argparse
+import hashlib
+import time
+from datetime import datetime, timedelta
+
+import requests
+from database import (
+    finish_run,
+    insert_listings,
+    page_states,
+    register_watched,
+    save_page_states,
+    save_watched,
+    start_run,
+    watched_categories,
+)
+from dedup import ListingIndex
+from fetcher import get_fetcher
+from main import (
+    BATCH_CATEGORIES,
+    MAX_REQUESTS,
+    add_common_arguments,
+    configure_fetcher,
+    configure_metrics,
+    crawl_categories,
+    read_queries,
+    report_metrics,
+    search_url,
+)
+from mercadolibre import (
+    fetch_page,
+    fetch_pages,
+    get_categories,
+    iter_pages,
+    parse_page,
+    plan_shards,
+)
+from metrics import get_metrics
+
+# Minutos entre revisiones de una categoría que cambió
+INTERVAL = 60
+
+# Tope en minutos del intervalo de una categoría que no cambia
+MAX_INTERVAL = 24 * 60
+
+# Minutos después de los que una categoría se recorre entera aunque su primera
+# página no haya cambiado
+FULL_SWEEP = 3 * 24 * 60
+
+# Minutos después de los que se vuelven a pedir las categorías de cada búsqueda
+CATEGORIES_REFRESH = 24 * 60
+
+# Espera mínima entre rondas, en segundos
+MIN_SLEEP = 5
+
+# Cómo queda registrada en `corridas` una ronda del modo vigilancia
+WATCH_LABEL = "vigilancia: {}"
+
+# Lo que devuelve `PageStates.fetch` cuando el servidor contestó 304
+NOT_MODIFIED = object()
+
+
+def fingerprint(listings) -> str:
+    """Huella de las publicaciones de una página; no cambia si solo cambia el orden"""
+    digest = hashlib.blake2b(digest_size=16)
+    for record in sorted(
+        (listing.item_id or "", listing.title.strip(), listing.price)
+        for listing in listings
+    ):
+        digest.update(repr(record).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PageStates:
+    """
+    La última versión vista de cada página de una categoría vigilada.
+
+    `fetch(url)` pide la página con GET condicional usando los validadores guardados
+    y devuelve el HTML o `NOT_MODIFIED`. `changed(url, listings)` compara la huella
+    con la que estaba guardada al empezar (así se puede preguntar más de una vez por
+    la misma página). `save()` guarda lo visto en la base. `fetch` se puede usar
+    desde varios hilos a la vez.
+    """
+
+    def __init__(self, clave: str, limiter=None, fetcher=None):
+        self.clave = clave
+        self.limiter = limiter
+        self.fetcher = fetcher or get_fetcher()
+        self.previous = page_states(clave)
+        self.current = {}
+
+    def _state(self, url: str):
+        return self.current.get(url) or self.previous.get(url) or (None, None, None)
+
+    def fetch(self, url: str):
+        etag, last_modified, huella = self._state(url)
+        response = self.fetcher.get_conditional(
+            url, etag, last_modified, limiter=self.limiter
+        )
+        self.current[url] = (response.etag, response.last_modified, huella)
+        return NOT_MODIFIED if response.html is None else response.html
+
+    def changed(self, url: str, listings) -> bool:
+        huella = fingerprint(listings)
+        etag, last_modified, _ = self._state(url)
+        self.current[url] = (etag, last_modified, huella)
+        return (self.previous.get(url) or (None, None, None))[2] != huella
+
+    def save(self):
+        save_page_states(self.clave, self.current)
+
+
+def listings_of(page_url: str, html):
+    """Las publicaciones con precio de una página ya descargada"""
+    return parse_page((None, page_url, html))[2]
+
+
+def watch_category(
+    fila: dict,
+    limiter,
+    corrida_id: int,
+    max_requests: int = MAX_REQUESTS,
+    seen=None,
+    interval: float = INTERVAL,
+    max_interval: float = MAX_INTERVAL,
+    full_sweep: float = FULL_SWEEP,
+):
+    """Revisa una categoría vigilada (una fila de `database.watched_categories`).
+
+    Si la primera página no cambió y no toca recorrerla entera, alarga el intervalo y
+    termina ahí. Si no, la recorre como `main.stream_category` (por rangos de precio
+    si hace falta) y guarda en la corrida solo las páginas que cambiaron. Actualiza la
+    agenda de la categoría y devuelve {"paginas", "sin_cambios", "guardadas"}.
+    """
+    now = datetime.utcnow()
+    link = fila["link"]
+    states = PageStates(fila["clave"], limiter)
+    metrics = get_metrics()
+    resultado = {"paginas": 1, "sin_cambios": 0, "guardadas": 0}
+    fila = {**fila, "ultima_revision": now}
+
+    try:
+        first = states.fetch(link)
+    except requests.exceptions.RequestException as error:
+        print(f"Error al revisar {fila['clave']}: {error}")
+        fila.update(proxima=now + timedelta(minutes=fila["intervalo"] or interval))
+        save_watched(fila)
+        return resultado
+    changed = first is not NOT_MODIFIED and states.changed(
+        link, listings_of(link, first)
+    )
+    ultima_completa = fila["ultima_completa"]
+    full = ultima_completa is None or now - ultima_completa >= timedelta(
+        minutes=full_sweep
+    )
+
+    if changed or full:
+        if first is NOT_MODIFIED:
+            # Para saber cuántas páginas hay hace falta el HTML de la primera
+            first = fetch_page(link, limiter=limiter)
+        unchanged = failed = 0
+
+        def changed_listings():
+            nonlocal unchanged, failed
+            for shard in plan_shards(link, first_html=first, limiter=limiter):
+                for page, page_url, html in iter_pages(
+                    shard.url,
+                    max_workers=max_requests,
+                    limiter=limiter,
+                    first_html=shard.html,
+                    fetch=states.fetch,
+                ):
+                    # La primera página de la categoría ya se contó al revisarla
+                    resultado["paginas"] += page_url != link
+                    if html is None:
+                        failed += 1
+                        continue
+                    if html is not NOT_MODIFIED:
+                        listings = listings_of(page_url, html)
+                        if states.changed(page_url, listings):
+                            yield from (
+                                seen.filter(listings) if seen is not None else listings
+                            )
+                            continue
+                    unchanged += 1
+                    metrics.inc("unchanged_pages_total")
+
+        try:
+            resultado["guardadas"] = insert_listings(
+                fila["categoria"], changed_listings(), corrida_id=corrida_id
+            )
+        except requests.exceptions.RequestException as error:
+            print(f"Error al revisar {fila['clave']}: {error}")
+            failed += 1
+        resultado["sin_cambios"] = unchanged
+        changed = changed or resultado["guardadas"] > 0
+        if not failed:
+            fila["ultima_completa"] = now
+    else:
+        resultado["sin_cambios"] = 1
+        metrics.inc("unchanged_pages_total")
+
+    fila["sin_cambios"] = 0 if changed else fila["sin_cambios"] + 1
+    fila["intervalo"] = min(max_interval, interval * 2 ** fila["sin_cambios"])
+    fila["proxima"] = now + timedelta(minutes=fila["intervalo"])
+    states.save()
+    save_watched(fila)
+    print(
+        f"{fila['clave']}: {'cambió' if changed else 'sin cambios'}, "
+        f"próxima revisión en {fila['intervalo']:.0f} min ({resultado})"
+    )
+    return resultado
+
+
+def discover(queries, max_requests: int = MAX_REQUESTS) -> dict:
+    """Las categorías de cada búsqueda, como {"búsqueda / categoría": info}"""
+    categorias = {}
+    pages = fetch_pages([search_url(query) for query in queries], max_requests)
+    for query, html in zip(queries, pages):
+        if html is None:
+            print(f"No se pudo descargar la búsqueda '{query}'")
+            continue
+        try:
+            found = get_categories(html)
+        except Exception as error:
+            # Un markup inesperado en una búsqueda no corta la vigilancia de las demás
+            print(f"No se pudieron leer las categorías de '{query}': {error!r}")
+            continue
+        if not found:
+            print(f"La búsqueda '{query}' no tiene resultados ni categorías")
+            continue
+        for links in found.values():
+            for name, info in links.items():
+                if info.get("link"):
+                    categorias[f"{query} / {name}"] = {
+                        **info,
+                        "busqueda": query,
+                        "categoria": name,
+                    }
+    return categorias
+
+
+def watch(
+    queries,
+    interval: float = INTERVAL,
+    max_interval: float = MAX_INTERVAL,
+    full_sweep: float = FULL_SWEEP,
+    rounds: int = None,
+    dedup: bool = True,
+    max_requests: int = MAX_REQUESTS,
+    max_categories: int = BATCH_CATEGORIES,
+):
+    """Revisa las categorías de `queries` a medida que les toca, para siempre o
+    durante `rounds` rondas. Los intervalos van en minutos."""
+    queries = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+    label = WATCH_LABEL.format(" | ".join(queries))
+    claves = []
+    discovered = None
+    done = 0
+    while True:
+        now = datetime.utcnow()
+        if discovered is None or now - discovered >= timedelta(
+            minutes=CATEGORIES_REFRESH
+        ):
+            categorias = discover(queries, max_requests)
+            if categorias:
+                register_watched(categorias)
+                claves = list(categorias)
+                discovered = now
+            print(f"{len(queries)} búsquedas, {len(claves)} categorías vigiladas")
+
+        # Las categorías recién agregadas quedan para revisar desde este momento
+        now = datetime.utcnow()
+        agenda = watched_categories(claves)
+        due = {clave: fila for clave, fila in agenda.items() if fila["proxima"] <= now}
+        if due:
+            print(f"Revisando {len(due)} de {len(agenda)} categorías")
+            corrida_id = start_run(label)
+            seen = ListingIndex() if dedup else None
+            resultados = crawl_categories(
+                {
+                    clave: {"link": fila["link"], "cantidad": fila["cantidad"]}
+                    for clave, fila in due.items()
+                },
+                max_requests,
+                task=lambda clave, link, limiter: watch_category(
+                    due[clave],
+                    limiter,
+                    corrida_id,
+                    max_requests,
+                    seen=seen,
+                    interval=interval,
+                    max_interval=max_interval,
+                    full_sweep=full_sweep,
+                ),
+                max_categories=max_categories,
+            )
+            finish_run(corrida_id)
+            print(
+                f"Corrida {corrida_id}: "
+                f"{sum(r['guardadas'] for r in resultados.values())} publicaciones "
+                f"guardadas, {sum(r['sin_cambios'] for r in resultados.values())} "
+                f"de {sum(r['paginas'] for r in resultados.values())} páginas sin "
+                f"cambios"
+            )
+            print(f"Solicitudes HTTP: {get_fetcher().summary()}")
+
+        done += 1
+        if rounds is not None and done >= rounds:
+            return
+        proxima = min(
+            (fila["proxima"] for fila in watched_categories(claves).values()),
+            default=now + timedelta(minutes=interval),
+        )
+        wait = max(MIN_SLEEP, (proxima - datetime.utcnow()).total_seconds())
+        print(f"Próxima revisión en {wait / 60:.1f} min")
+        time.sleep(wait)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("busquedas", nargs="*", help="Artículos a vigilar")
+    add_common_arguments(parser)
+    parser.add_argument(
+        "--batch",
+        default=None,
+        metavar="ARCHIVO",
+        help="Vigila también las búsquedas del archivo (una por línea)",
+    )
+    parser.add_argument(
+        "--intervalo",
+        type=float,
+        default=INTERVAL,
+        help=f"Minutos entre revisiones de una categoría que cambió ({INTERVAL})",
+    )
+    parser.add_argument(
+        "--intervalo-max",
+        type=float,
+        default=MAX_INTERVAL,
+        help=f"Tope en minutos para las categorías que no cambian ({MAX_INTERVAL})",
+    )
+    parser.add_argument(
+        "--completa",
+        type=float,
+        default=FULL_SWEEP,
+        help=f"Minutos entre recorridas completas de cada categoría ({FULL_SWEEP})",
+    )
+    parser.add_argument(
+        "--rondas",
+        type=int,
+        default=None,
+        help="Hace N rondas y termina (por defecto sigue hasta que se lo corte)",
+    )
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_fetcher(args)
+    configure_metrics(args)
+    queries = args.busquedas + (read_queries(args.batch) if args.batch else [])
+    if not queries:
+        raise SystemExit("No hay búsquedas para vigilar")
+    try:
+        watch(
+            queries,
+            interval=args.intervalo,
+            max_interval=args.intervalo_max,
+            full_sweep=args.completa,
+            rounds=args.rondas,
+            dedup=args.dedup,
+        )
+    except KeyboardInterrupt:
+        print("Vigilancia cortada")
+    finally:
+        report_metrics(args)
@@ -7,14 +7,29 @@ from bs4 import BeautifulSoup
 URL = "https://pypi.org/search/?q="
 
 
-def get_categories(save=False, path: str = ".") -> pd.DataFrame:
-    """ "Devuelve un dataframe y si save es True guarda una copia en formato csv"""
+def get_categories(
+    save=False, path: str = ".", cache=None, replay: bool = False
+) -> pd.DataFrame:
+    """ "Devuelve un dataframe y si save es True guarda una copia en formato csv.
+
+    :param cache: Caché de HTML opcional con métodos `get(url, ignore_ttl)` y
+        `put(url, html)`, por ejemplo `mercadoscrap.cache.HtmlCache`.
+    :param replay: Si es True no se sale a la red y la página se sirve de la caché.
+    """
 
     try:
-        # Realizar la solicitud HTTP a PyPI con un timeout de 10 segundos
-        response = requests.get(URL, timeout=10)
-        response.raise_for_status()  # Esto lanza una excepción para códigos de estado HTTP 4xx/5xx 💀
-        soup = BeautifulSoup(response.content, "html.parser")
+        html = cache.get(URL, ignore_ttl=replay) if cache is not None else None
+        if html is None:
+            if replay:
+                print(f"{URL} no está en la caché (modo replay).")
+                return None
+            # Realizar la solicitud HTTP a PyPI con un timeout de 10 segundos
+            response = requests.get(URL, timeout=10)
+            response.raise_for_status()  # Esto lanza una excepción para códigos de estado HTTP 4xx/5xx 💀
+            html = response.text
+            if cache is not None:
+                cache.put(URL, html)
+        soup = BeautifulSoup(html, "html.parser")
 
         # Lista para almacenar las categorías
         categories = []